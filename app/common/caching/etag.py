@@ -0,0 +1,53 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+from starlette import status
+
+
+# Weak ETag for one version of one row
+def row_etag(row_id: int, version: int) -> str:
+    return f'W/"{row_id}-{version}"'
+
+
+# Weak ETag for a list, from every (id, version) pair it contains plus extra parts such as the total
+def list_etag(pairs: Iterable[Tuple[int, int]], *extra: Any) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in extra:
+        digest.update(f"{part};".encode())
+    for row_id, version in pairs:
+        digest.update(f"{row_id}:{version},".encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+# Format a timestamp as an HTTP date (Last-Modified)
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+# ETag / Last-Modified response headers
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+# True when the request's If-None-Match is "*" or lists the ETag (weak comparison)
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+# Empty 304 response carrying the current validators
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
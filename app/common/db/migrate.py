@@ -0,0 +1,21 @@
+"""
+Create the database schema (tables, indexes and required extensions).
+
+Run once per deploy, before starting the app; it only creates what is missing:
+
+    python -m app.common.db.migrate
+"""
+from app.common.db.base import Base
+from app.common.db.session import get_engine
+import app.models.userModel  # noqa: F401  (registers the users table on Base.metadata)
+import app.models.userChangeModel  # noqa: F401  (and the change log tables)
+
+
+# Create every table and index declared on the models that doesn't exist yet
+def migrate() -> None:
+    Base.metadata.create_all(bind=get_engine())
+
+
+if __name__ == "__main__":
+    migrate()
+    print("Schema is up to date")
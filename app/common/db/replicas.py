@@ -0,0 +1,192 @@
+import asyncio
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from app.common.config.config import FromSettings
+from app.common.db.session import SessionLocal, get_engine, get_replica_engines
+from app.common.notifications.bus import READ_PINS, event_bus
+from app.common.ratelimit.limiter import principal_key
+
+# Seconds a replica is behind the primary: 0 once it has replayed all the WAL it received
+# (after a restart the receive position can even trail the replay one), otherwise the age
+# of the last transaction it replayed. NULL (taken as 0) on a server that isn't a standby,
+# which is what two independent local databases look like.
+LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() <= pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+# Requests that count as writes for read-your-writes pinning
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class ReplicaSet:
+    """
+    Routing state for reads across the read replicas.
+
+    Replicas are taken round-robin, skipping the ones that failed to connect or
+    were further behind than max_lag_seconds at the last check. A caller that
+    wrote within pin_seconds (in any worker, through the event bus) is pinned to
+    the primary so it reads its own writes.
+    """
+    max_lag_seconds = FromSettings("replica_max_lag_seconds")
+    pin_seconds = FromSettings("read_your_writes_seconds")
+    max_pins = 100_000
+
+    def __init__(self):
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        # Replica indexes out of rotation until a check finds them healthy again
+        self._excluded: frozenset[int] = frozenset()
+        # Lag in seconds per replica index at the last check; None when it was unreachable
+        self.lag: Dict[int, Optional[float]] = {}
+        # Caller key -> wall-clock time until which its reads go to the primary
+        self._pins: Dict[str, float] = {}
+
+        # Metrics: reads served by a replica, by the primary because the caller was
+        # pinned, and by the primary because no replica was usable
+        self.replica_reads = 0
+        self.pinned_reads = 0
+        self.fallback_reads = 0
+
+    # Replica indexes to try for one read, in round-robin order, skipping the ones out of rotation
+    def candidates(self, count: int) -> List[int]:
+        start = next(self._next) % count
+        excluded = self._excluded
+        return [index for index in ((start + n) % count for n in range(count)) if index not in excluded]
+
+    def mark_down(self, index: int) -> None:
+        with self._lock:
+            if index not in self._excluded:
+                logger.warning("Read replica {} is unreachable, taking it out of rotation", index)
+                self._excluded = self._excluded | {index}
+
+    # Run the lag query on every replica and update the rotation; blocking, called off the event loop
+    def check(self, engines: List[Engine]) -> None:
+        for index, engine in enumerate(engines):
+            try:
+                with engine.connect() as conn:
+                    lag = float(conn.execute(LAG_SQL).scalar() or 0)
+            except DBAPIError:
+                self.lag[index] = None
+                self.mark_down(index)
+                continue
+            self.lag[index] = lag
+            healthy = lag <= self.max_lag_seconds
+            with self._lock:
+                if healthy and index in self._excluded:
+                    logger.info("Read replica {} is back in rotation (lag {:.2f}s)", index, lag)
+                    self._excluded = self._excluded - {index}
+                elif not healthy and index not in self._excluded:
+                    logger.warning("Read replica {} is {:.2f}s behind, taking it out of rotation", index, lag)
+                    self._excluded = self._excluded | {index}
+
+    async def monitor(self, engines: List[Engine], interval: float) -> None:
+        while True:
+            await asyncio.to_thread(self.check, engines)
+            await asyncio.sleep(interval)
+
+    def pin(self, caller: str, until: float) -> None:
+        with self._lock:
+            if len(self._pins) >= self.max_pins:
+                now = time.time()
+                self._pins = {key: expires for key, expires in self._pins.items() if expires > now}
+            if until > self._pins.get(caller, 0.0):
+                self._pins[caller] = until
+
+    def is_pinned(self, caller: str) -> bool:
+        until = self._pins.get(caller)
+        return until is not None and until > time.time()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "replicas_excluded": len(self._excluded),
+            "replica_reads": self.replica_reads,
+            "pinned_reads": self.pinned_reads,
+            "fallback_reads": self.fallback_reads,
+            "pins": len(self._pins),
+        }
+
+
+replica_set = ReplicaSet()
+
+
+def get_read_db(request: Request):
+    """
+    Dependency to get a DB session for reads: on a read replica when one is
+    configured and healthy, otherwise on the primary
+    """
+    primary = get_engine()
+    engines = get_replica_engines()
+    db = None
+    if engines:
+        if replica_set.is_pinned(principal_key(request)):
+            replica_set.pinned_reads += 1
+        else:
+            for index in replica_set.candidates(len(engines)):
+                session = SessionLocal(bind=engines[index])
+                try:
+                    # Check out the connection now, so an unreachable replica falls back before the route runs
+                    session.connection()
+                except DBAPIError:
+                    session.close()
+                    replica_set.mark_down(index)
+                    continue
+                replica_set.replica_reads += 1
+                db = session
+                break
+            else:
+                replica_set.fallback_reads += 1
+    if db is None:
+        db = SessionLocal(bind=primary)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Pin a caller to the primary in every worker for pin_seconds
+async def publish_pin(caller: str) -> None:
+    until = time.time() + replica_set.pin_seconds
+    # Pinned here first: the bus may deliver to this worker after the caller's next request
+    replica_set.pin(caller, until)
+    await event_bus.publish(READ_PINS, {"caller": caller, "until": until})
+
+
+# Apply a pin published by any worker
+async def apply_pin(payload: dict) -> None:
+    replica_set.pin(payload["caller"], payload["until"])
+
+
+event_bus.subscribe(READ_PINS, apply_pin)
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware pinning callers whose write succeeded to the primary, so their
+    next reads don't hit a replica that hasn't replayed the write yet.
+
+    Only added when read replicas are configured.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_and_pin(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                await publish_pin(principal_key(Request(scope)))
+            await send(message)
+
+        await self.app(scope, receive, send_and_pin)
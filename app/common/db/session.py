@@ -1,23 +1,133 @@
+import threading
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.common.config.config import settings
+from app.common.metrics.db import TimedAsyncAdaptedQueuePool, TimedQueuePool, instrument_engine
+
+# Engines are created on first use (at the latest by the app's lifespan), so importing
+# this module reads no settings and opens no connections. `engine` and `async_engine`
+# remain importable names through the module __getattr__ below.
+_engine: Engine | None = None
+_async_engine: AsyncEngine | None = None
+_replica_engines: list[Engine] | None = None
+_lock = threading.Lock()
 
-# Create engine with stringified URL
-engine = create_engine(str(settings.database_url))
+# Seconds allowed to open a connection to a read replica
+REPLICA_CONNECT_TIMEOUT = 2
 
-# Session factory
+# Session factory; bound to the engine when it is created
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
-    bind=engine,
 )
 
+# Async session factory; objects stay loaded after commit so routes can serialize them without lazy loads
+AsyncSessionLocal = async_sessionmaker(
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+# Pool sizing shared by both engines
+def _pool_options() -> dict:
+    return dict(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+    )
+
+
+# Create (once) the sync engine and bind SessionLocal to it
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                # Create engine with stringified URL
+                engine = create_engine(str(settings.database_url), poolclass=TimedQueuePool, **_pool_options())
+                instrument_engine(engine, "sync")
+                SessionLocal.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+
+# Create (once) a sync engine per read replica, labelled replica0, replica1, ... in the metrics
+def get_replica_engines() -> list[Engine]:
+    global _replica_engines
+    if _replica_engines is None:
+        with _lock:
+            if _replica_engines is None:
+                engines = []
+                for n, url in enumerate(settings.database_replica_urls):
+                    engine = create_engine(
+                        str(url),
+                        poolclass=TimedQueuePool,
+                        # Fail fast on an unreachable replica so reads fall back to the primary quickly
+                        connect_args={"connect_timeout": REPLICA_CONNECT_TIMEOUT},
+                        **_pool_options(),
+                    )
+                    engine.pool.metrics_label = f"replica{n}"
+                    instrument_engine(engine, f"replica{n}")
+                    engines.append(engine)
+                _replica_engines = engines
+    return _replica_engines
+
+
+# Create (once) the async engine on the asyncpg driver and bind AsyncSessionLocal to it;
+# used by the async routes so DB round trips don't block the event loop
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        with _lock:
+            if _async_engine is None:
+                async_engine = create_async_engine(
+                    make_url(str(settings.database_url)).set(drivername="postgresql+asyncpg"),
+                    poolclass=TimedAsyncAdaptedQueuePool,
+                    **_pool_options(),
+                )
+                instrument_engine(async_engine.sync_engine, "async")
+                AsyncSessionLocal.configure(bind=async_engine)
+                _async_engine = async_engine
+    return _async_engine
+
+
+# Dispose whichever engines were created
+async def dispose_engines() -> None:
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+    for replica in _replica_engines or ():
+        replica.dispose()
+
+
+def __getattr__(name: str):
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def get_db():
     """
     Dependency to get DB session
     """
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Dependency to get an async DB session
+    """
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,3 +1,4 @@
+import math
 from fastapi import HTTPException, status
 
 class EntityNotFound(HTTPException):
@@ -27,3 +28,71 @@ class DuplicateEntity(HTTPException):
             status_code=status.HTTP_409_CONFLICT,
             detail=f"{name} with the same {key} already exists"
         )
+
+
+class InvalidCursor(HTTPException):
+    """
+    Exception for handling malformed pagination cursors (400).
+    """
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+class CursorExpired(HTTPException):
+    """
+    Exception for change feed cursors older than the compacted part of the log (410).
+    """
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_410_GONE,
+            detail="Changes after this cursor were compacted; restart the feed without a cursor"
+        )
+
+
+class ServiceUnavailable(HTTPException):
+    """
+    Exception for handling saturated internal resources (503).
+    
+    Args:
+        name (str): Resource that is saturated
+        retry_after (int): Seconds the client should wait before retrying
+    """
+    def __init__(self, name: str, retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{name} is busy, please retry",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class RateLimited(HTTPException):
+    """
+    Exception for handling requests over their rate limit (429).
+    
+    Args:
+        retry_after (float): Seconds until the next request would be allowed
+    """
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+
+class BatchTooLarge(HTTPException):
+    """
+    Exception for bulk requests with more items than allowed (413).
+    
+    Args:
+        limit (int): Maximum number of items per request
+    """
+    def __init__(self, limit: int):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {limit} items are allowed per bulk request",
+        )
@@ -0,0 +1,95 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.common.metrics.registry import COUNT_BUCKETS, registry
+
+
+class RequestDbStats:
+    """Queries issued and time spent in the database while serving one request."""
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Set by the metrics middleware for the duration of each HTTP request
+request_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("request_db_stats", default=None)
+
+query_duration = registry.histogram(
+    "db_query_duration_seconds", "Time spent executing single SQL statements", ["engine"],
+)
+checkout_wait = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ["pool"],
+)
+queries_per_request = registry.histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request", ["route"], buckets=COUNT_BUCKETS,
+)
+db_time_per_request = registry.histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per HTTP request", ["route"],
+)
+
+# (label, engine) pairs whose pools are reported by the db_pool_connections gauge
+_engines: List[Tuple[str, Engine]] = []
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+    metrics_label = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            checkout_wait.observe(time.perf_counter() - started, self.metrics_label)
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waited for a connection."""
+    metrics_label = "async"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            checkout_wait.observe(time.perf_counter() - started, self.metrics_label)
+
+
+# Count and time every statement run on the engine, globally and for the current request
+def instrument_engine(engine: Engine, label: str) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_started
+        query_duration.observe(elapsed, label)
+        stats = request_db_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+
+    _engines.append((label, engine))
+
+
+# Pool occupancy per engine: connections checked out, idle in the pool, and overflow in use
+def _pool_connections() -> Dict[Tuple[str, str], float]:
+    values = {}
+    for label, engine in _engines:
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            values[(label, "checked_out")] = pool.checkedout()
+            values[(label, "idle")] = pool.checkedin()
+            values[(label, "overflow")] = max(pool.overflow(), 0)
+    return values
+
+
+registry.gauge("db_pool_connections", "Pooled database connections by state", _pool_connections, ["pool", "state"])
@@ -0,0 +1,45 @@
+import time
+
+from app.common.metrics.db import RequestDbStats, db_time_per_request, queries_per_request, request_db_stats
+from app.common.metrics.registry import registry
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route", "status"],
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency and per-request database usage.
+
+    Routes are labeled by their template (e.g. /api/v1/users/{user_id}), which the
+    router stores in the scope once it has matched, so label cardinality stays bounded.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestDbStats()
+        token = request_db_stats.set(stats)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_db_stats.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            request_duration.observe(elapsed, scope["method"], route, str(status_code))
+            queries_per_request.observe(stats.queries, route)
+            db_time_per_request.observe(stats.seconds, route)
@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.common.db.replicas import replica_set
+from app.common.metrics.registry import from_stats, registry, single
+from app.common.notifications.notification import manager
+from app.common.pagination.count import count_cache
+from app.common.utils.logger import log_writer_stats
+from app.modules.auth.token.passwordHasher import password_hasher
+from app.modules.auth.user.principalCache import principal_cache
+from app.modules.users.search.trigramIndex import search_index
+
+router = APIRouter()
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry.gauge("ws_connections", "Open WebSocket connections", single(lambda: manager.stats()["connections"]))
+registry.gauge(
+    "ws_subscriptions", "WebSocket subscriptions by kind",
+    lambda: {
+        ("id",): manager.stats()["id_subscriptions"],
+        ("search",): manager.stats()["search_subscriptions"],
+        ("batched",): manager.stats()["batched"],
+    },
+    ["kind"],
+)
+registry.gauge("ws_lagging_connections", "WebSocket connections that dropped messages", single(lambda: manager.stats()["lagging"]))
+registry.gauge("ws_last_broadcast_seconds", "Duration of the most recent WebSocket fan-out", single(lambda: manager.last_broadcast_seconds))
+registry.gauge("password_hasher", "Password hashing pool statistics", from_stats(password_hasher.stats), ["stat"])
+registry.gauge("principal_cache", "Principal cache statistics", from_stats(principal_cache.stats), ["stat"])
+registry.gauge("count_cache", "Cached page totals (COUNT_STRATEGY=cached)", from_stats(count_cache.stats), ["stat"])
+registry.gauge("search_index", "In-memory search index statistics", from_stats(search_index.stats), ["stat"])
+registry.gauge("db_read_routing", "Reads routed by get_read_db and read-your-writes pins", from_stats(replica_set.stats), ["stat"])
+registry.gauge(
+    "db_replica_lag_seconds", "Replication lag of each read replica at the last check",
+    lambda: {(f"replica{index}",): lag for index, lag in replica_set.lag.items() if lag is not None},
+    ["replica"],
+)
+registry.gauge("log_writer", "Background log writer queue (records queued and dropped)", from_stats(log_writer_stats), ["stat"])
+
+
+# Metrics for this worker in the Prometheus text format
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,212 @@
+import abc
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import asyncpg
+from loguru import logger
+from sqlalchemy.engine import make_url
+
+from app.common.config.config import settings
+
+# Topics carried by the bus
+USER_EVENTS = "users"
+TOKEN_VERSIONS = "token_versions"
+READ_PINS = "read_pins"
+
+Handler = Callable[[Any], Awaitable[None]]
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_PAYLOAD = 7999
+# Room left in each message for the topic/payload envelope around chunked items
+ENVELOPE_BYTES = 128
+
+
+# USER_EVENTS payloads are single events, or {"type": "batch", "events": [...]} from bulk writes
+def user_events(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return payload["events"] if payload["type"] == "batch" else [payload]
+
+
+# Build a USER_EVENTS event from a user row that carries its `version` column. The version moves
+# to the event, where consumers compare it with what they hold to drop stale events: events for one
+# user published by different workers can arrive out of order. A delete counts as one more change.
+def user_event(event_type: str, user: Dict[str, Any]) -> Dict[str, Any]:
+    version = user.pop("version")
+    if event_type == "deleted":
+        version += 1
+    return {"type": event_type, "version": version, "user": user}
+
+
+# Split items into lists small enough to be published as one message each
+def chunk_for_notify(items: List[Any]) -> List[List[Any]]:
+    chunks: List[List[Any]] = []
+    current: List[Any] = []
+    size = ENVELOPE_BYTES
+    for item in items:
+        item_size = len(json.dumps(item).encode()) + 2
+        if current and size + item_size > NOTIFY_MAX_PAYLOAD:
+            chunks.append(current)
+            current, size = [], ENVELOPE_BYTES
+        current.append(item)
+        size += item_size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class EventBus(abc.ABC):
+    """
+    Pub/sub transport behind ConnectionManager.broadcast_event.
+
+    Every worker publishes an event once; the bus delivers it to the handlers
+    subscribed in every worker (including the publisher), one message at a
+    time and in the order the transport received them.
+    """
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = {}
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self._handlers.setdefault(topic, []).append(handler)
+
+    @abc.abstractmethod
+    async def publish(self, topic: str, payload: Any) -> None:
+        ...
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def _dispatch(self, topic: str, payload: Any) -> None:
+        for handler in self._handlers.get(topic, ()):
+            try:
+                await handler(payload)
+            except Exception:
+                logger.exception("Event bus handler failed for topic {}", topic)
+
+
+class InProcessBus(EventBus):
+    """Delivers events to this process only (single worker deployments)."""
+    async def publish(self, topic: str, payload: Any) -> None:
+        await self._dispatch(topic, payload)
+
+
+class PostgresNotifyBus(EventBus):
+    """
+    Cross-worker bus on Postgres LISTEN/NOTIFY.
+
+    Each worker keeps one listening connection and one publishing connection.
+    Publishes from a worker go out one at a time over the same connection, and
+    Postgres delivers notifications in commit order, so every worker sees each
+    publisher's events in order. Events are published after the write committed,
+    so two workers writing the same user may publish its versions out of order;
+    user events carry the row version for consumers to drop the stale ones.
+    Events published while the listener is reconnecting are not replayed.
+    """
+    def __init__(self, dsn: str, channel: str, reconnect_delay: float = 1.0):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._publisher: Optional[asyncpg.Connection] = None
+        self._publish_lock = asyncio.Lock()
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._listen_loop()),
+            asyncio.create_task(self._dispatch_loop()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._publisher is not None:
+            await self._publisher.close()
+            self._publisher = None
+
+    async def publish(self, topic: str, payload: Any) -> None:
+        message = json.dumps({"topic": topic, "payload": payload})
+        if len(message.encode()) > NOTIFY_MAX_PAYLOAD:
+            raise ValueError(f"Event too large for NOTIFY ({len(message)} bytes)")
+        async with self._publish_lock:
+            if self._publisher is None or self._publisher.is_closed():
+                self._publisher = await asyncpg.connect(self.dsn)
+            await self._publisher.execute("SELECT pg_notify($1, $2)", self.channel, message)
+
+    def _on_notify(self, connection, pid, channel, message: str) -> None:
+        self._inbox.put_nowait(message)
+
+    async def _listen_loop(self) -> None:
+        while True:
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _: closed.set())
+                await conn.add_listener(self.channel, self._on_notify)
+                try:
+                    await closed.wait()
+                finally:
+                    await conn.close()
+                logger.warning("Event bus listener connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Event bus listener failed, reconnecting")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            message = json.loads(await self._inbox.get())
+            await self._dispatch(message["topic"], message["payload"])
+
+
+# Build the bus selected by settings.event_bus_backend
+def create_event_bus() -> EventBus:
+    if settings.event_bus_backend == "postgres":
+        dsn = make_url(str(settings.database_url)).set(drivername="postgresql")
+        return PostgresNotifyBus(dsn.render_as_string(hide_password=False), settings.event_bus_channel)
+    return InProcessBus()
+
+
+class ConfiguredBus(EventBus):
+    """
+    The process-wide bus. Handlers subscribe at import time; the transport selected
+    by settings.event_bus_backend is created on first start or publish and shares
+    this bus's handler registry.
+
+    Publishing is best-effort: callers publish after their transaction committed, so
+    a transport failure (lost connection, oversized payload) is logged rather than
+    failing a request whose write succeeded.
+    """
+    def __init__(self):
+        super().__init__()
+        self._transport: Optional[EventBus] = None
+
+    @property
+    def transport(self) -> EventBus:
+        if self._transport is None:
+            transport = create_event_bus()
+            transport._handlers = self._handlers
+            self._transport = transport
+        return self._transport
+
+    async def publish(self, topic: str, payload: Any) -> None:
+        try:
+            await self.transport.publish(topic, payload)
+        except Exception:
+            logger.exception("Event bus publish failed for topic {}", topic)
+
+    async def start(self) -> None:
+        await self.transport.start()
+
+    async def stop(self) -> None:
+        if self._transport is not None:
+            await self._transport.stop()
+
+
+event_bus = ConfiguredBus()
@@ -0,0 +1,175 @@
+from collections import deque
+from typing import Any, Dict, Generic, Hashable, Iterable, List, Set, Tuple, TypeVar
+
+Key = TypeVar("Key", bound=Hashable)
+
+# Patterns added since the last build are checked one by one (plain `in`) until there are
+# REBUILD_PENDING of them, or 1/REBUILD_FRACTION of the automaton's size, whichever is more;
+# then the automaton is rebuilt with them. Rebuilds stay rare under subscription churn, and
+# their cost is amortized over the additions that triggered them.
+REBUILD_PENDING = 32
+REBUILD_FRACTION = 8
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over a fixed set of patterns.
+
+    find() reports every pattern occurring in a text in one pass over it, in time
+    proportional to the text length plus the number of occurrences, however many
+    patterns there are.
+    """
+    def __init__(self, patterns: Iterable[str]):
+        # State 0 is the root; each state has its transitions, failure link and output patterns
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[str, ...]] = [()]
+        for pattern in patterns:
+            self._insert(pattern)
+        self._link()
+
+    def _insert(self, pattern: str) -> None:
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] += (pattern,)
+
+    # Breadth-first failure links; each state's outputs absorb those of its failure state
+    def _link(self) -> None:
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                link = fail[state]
+                while link and char not in goto[link]:
+                    link = fail[link]
+                # Children of the root fall back to the root
+                fail[nxt] = goto[link].get(char, 0) if state else 0
+                out[nxt] += out[fail[nxt]]
+
+    def find(self, text: str) -> Set[str]:
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[str] = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class _FieldPatterns(Generic[Key]):
+    """The patterns subscribed on one field, and the keys subscribed to each."""
+    def __init__(self):
+        self.keys: Dict[str, Set[Key]] = {}
+        self._automaton = AhoCorasick(())
+        # Patterns the automaton was built from
+        self._built: Set[str] = set()
+        # Subscribed patterns not yet in the automaton
+        self._pending: Set[str] = set()
+        # Patterns still in the automaton that nobody subscribes to anymore
+        self._stale = 0
+
+    def add(self, pattern: str, key: Key) -> None:
+        keys = self.keys.get(pattern)
+        if keys is None:
+            keys = self.keys[pattern] = set()
+            if pattern in self._built:
+                self._stale -= 1
+            else:
+                self._pending.add(pattern)
+        keys.add(key)
+
+    def remove(self, pattern: str, key: Key) -> None:
+        keys = self.keys[pattern]
+        keys.discard(key)
+        if not keys:
+            del self.keys[pattern]
+            if pattern in self._pending:
+                self._pending.discard(pattern)
+            else:
+                self._stale += 1
+
+    # Subscribed patterns occurring in `text`
+    def find(self, text: str) -> Iterable[str]:
+        pending_limit = max(REBUILD_PENDING, len(self._built) // REBUILD_FRACTION)
+        if len(self._pending) >= pending_limit or self._stale > len(self.keys):
+            self._automaton = AhoCorasick(self.keys)
+            self._built = set(self.keys)
+            self._pending.clear()
+            self._stale = 0
+        found = self._automaton.find(text)
+        if self._stale:
+            found = [pattern for pattern in found if pattern in self.keys]
+        if self._pending:
+            found = [*found, *(pattern for pattern in self._pending if pattern in text)]
+        return found
+
+
+class SearchMatcher(Generic[Key]):
+    """
+    Matches user events against the substring filters of many subscriptions at once.
+
+    A subscription's filters ({"email": "@gmail.com", ...}) match a user when every
+    filter value occurs in the user's field of the same name, ignoring case. Filter
+    values are lowercased once when subscribing and indexed per field in an
+    Aho-Corasick automaton, so an event costs one pass over each subscribed field
+    plus the number of (pattern, subscription) matches, not one check per
+    subscription. Subscribing and unsubscribing only touch that subscription's
+    patterns; new patterns join the automaton in batches.
+    """
+    def __init__(self):
+        self._fields: Dict[str, _FieldPatterns[Key]] = {}
+        # (field, lowercased value) pairs of each subscription; empty values match anything and are left out
+        self._filters: Dict[Key, List[Tuple[str, str]]] = {}
+        # Subscriptions without any (non-empty) filter, matching every event
+        self._match_all: Set[Key] = set()
+
+    def __len__(self) -> int:
+        return len(self._filters)
+
+    def add(self, key: Key, filters: Dict[str, Any]) -> None:
+        """Subscribe `key` with `filters`, replacing its previous filters."""
+        self.remove(key)
+        pairs = [(field, str(value).lower()) for field, value in filters.items()]
+        pairs = [(field, pattern) for field, pattern in pairs if pattern]
+        self._filters[key] = pairs
+        if not pairs:
+            self._match_all.add(key)
+        for field, pattern in pairs:
+            self._fields.setdefault(field, _FieldPatterns()).add(pattern, key)
+
+    def remove(self, key: Key) -> None:
+        pairs = self._filters.pop(key, None)
+        if pairs is None:
+            return
+        self._match_all.discard(key)
+        for field, pattern in pairs:
+            patterns = self._fields[field]
+            patterns.remove(pattern, key)
+            if not patterns.keys:
+                del self._fields[field]
+
+    def match(self, user: Dict[str, Any]) -> List[Key]:
+        """Keys whose every filter occurs in the corresponding field of `user`."""
+        hits: Dict[Key, int] = {}
+        for field, patterns in self._fields.items():
+            text = str(user.get(field, "")).lower()
+            for pattern in patterns.find(text):
+                for key in patterns.keys[pattern]:
+                    hits[key] = hits.get(key, 0) + 1
+        filters = self._filters
+        matched = [key for key, count in hits.items() if count == len(filters[key])]
+        matched.extend(self._match_all)
+        return matched
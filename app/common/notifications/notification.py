@@ -1,70 +1,281 @@
+import asyncio
 import json
-from typing import Any, Dict, List, Union
+import time
+from typing import Any, Dict, List, Optional, Set
 from fastapi import WebSocket
+from loguru import logger
+from app.common.config.config import FromSettings
+from app.common.metrics.registry import registry
+from app.common.notifications.bus import USER_EVENTS, chunk_for_notify, event_bus, user_events
+from app.common.notifications.matcher import SearchMatcher
+
+broadcast_duration = registry.histogram(
+    "ws_broadcast_duration_seconds", "Time to fan one bus message (or batch window) out to WebSocket queues", ["mode"],
+)
+
+# Close code sent to clients that can't keep up (1013 = "try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
 
 class Subscription:
-    """Holds a WebSocket and its filter criteria."""
-    def __init__(self, ws: WebSocket, by_id: int = None, search: Dict[str, Any] = None):
+    """Holds a WebSocket, its filter criteria and its outgoing message queue."""
+    def __init__(self, ws: WebSocket, queue_size: int, by_id: int = None, search: Dict[str, Any] = None):
         self.ws = ws
         self.by_id = by_id
         self.search = search
+        # Bounded queue drained by a dedicated writer task, so one slow socket never delays the others
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        # Events dropped because the queue was full (only with the "drop" policy)
+        self.lagging = False
+        self.dropped = 0
+        # Batched connections get coalesced {"type": "batch", "events": [...]} frames
+        self.batched = False
 
 class ConnectionManager:
-    """Manages WebSocket connections and subscriptions for user events."""
-    def __init__(self):
-        # List to store active WebSocket subscriptions
-        self.active: List[Subscription] = []
+    """
+    Manages WebSocket connections and subscriptions for user events.
+
+    Connections are keyed by socket and ID subscriptions are indexed by user id, so
+    subscribing, disconnecting and finding ID subscribers are O(1). Search filters
+    are indexed by a SearchMatcher, which finds the matching subscriptions without
+    evaluating each one. Each event is serialized once and handed to the matching
+    connections' send queues.
+
+    Connections in batched mode receive events coalesced over `batch_window`
+    seconds: repeated events for the same user collapse into the latest one,
+    and recipients of the same set of events share one serialized frame.
+    Arguments left as None come from the settings on first use.
+    """
+    queue_size           = FromSettings("ws_send_queue_size")
+    slow_consumer_policy = FromSettings("ws_slow_consumer_policy")
+    batch_window         = FromSettings("ws_batch_window_ms", lambda ms: ms / 1000)
+
+    def __init__(self, queue_size: Optional[int] = None, slow_consumer_policy: Optional[str] = None, batch_window: Optional[float] = None):
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.batch_window = batch_window
+        # Active subscriptions keyed by their WebSocket
+        self.connections: Dict[WebSocket, Subscription] = {}
+        # user_id -> subscriptions watching that id
+        self.by_id: Dict[int, Set[Subscription]] = {}
+        # Subscriptions with search filters, indexed for matching
+        self.searching: SearchMatcher[Subscription] = SearchMatcher()
+        # Subscriptions in batched delivery mode, and the events waiting for the next flush
+        self.batched: Set[Subscription] = set()
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # Duration of the most recent fan-out, exported as a gauge
+        self.last_broadcast_seconds = 0.0
 
     async def connect(self, ws: WebSocket):
-        # Accept new WebSocket connection and add to active subscriptions
+        # Accept new WebSocket connection, register it and start its writer
         await ws.accept()
-        self.active.append(Subscription(ws))
+        sub = Subscription(ws, self.queue_size)
+        sub.writer = asyncio.create_task(self._write_loop(sub))
+        self.connections[ws] = sub
 
     def disconnect(self, ws: WebSocket):
-        # Remove WebSocket from active subscriptions
-        self.active = [s for s in self.active if s.ws != ws]
+        # Remove WebSocket from active subscriptions and stop its writer
+        sub = self.connections.pop(ws, None)
+        if sub is None:
+            return
+        self._unindex_id(sub)
+        self.searching.remove(sub)
+        self.batched.discard(sub)
+        if sub.writer is not None and sub.writer is not asyncio.current_task():
+            sub.writer.cancel()
 
     def subscribe_to_id(self, ws: WebSocket, user_id: int):
         # Subscribe WebSocket to specific user ID
-        for s in self.active:
-            if s.ws == ws:
-                s.by_id = user_id
+        sub = self.connections.get(ws)
+        if sub is None:
+            return
+        self._unindex_id(sub)
+        sub.by_id = user_id
+        self.by_id.setdefault(user_id, set()).add(sub)
 
     def subscribe_to_search(self, ws: WebSocket, filters: Dict[str, Any]):
         # Subscribe WebSocket to search filters
-        for s in self.active:
-            if s.ws == ws:
-                s.search = filters
+        sub = self.connections.get(ws)
+        if sub is None:
+            return
+        sub.search = filters
+        self.searching.add(sub, filters)
+
+    def set_batched(self, ws: WebSocket, batched: bool):
+        # Switch a connection between immediate and coalesced (batched) delivery
+        sub = self.connections.get(ws)
+        if sub is None:
+            return
+        sub.batched = batched
+        if batched:
+            self.batched.add(sub)
+        else:
+            self.batched.discard(sub)
+
+    def reject(self, ws: WebSocket, detail: str):
+        # Tell a client its last message was not understood, through its writer like any other frame
+        sub = self.connections.get(ws)
+        if sub is None:
+            return
+        self._enqueue(sub, json.dumps({"type": "error", "detail": detail}))
+
+    def _unindex_id(self, sub: Subscription):
+        if sub.by_id is None:
+            return
+        subs = self.by_id.get(sub.by_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self.by_id[sub.by_id]
 
     async def broadcast_event(self, event: Dict[str, Any]):
         """
-        Broadcast user events to relevant subscribers.
+        Broadcast user events to relevant subscribers in every worker.
         event = {
           "type": "created" | "updated" | "deleted",
+          "version": 3,  # row version after the change (see bus.user_event)
           "user": { ... }  # full user payload
         }
+        The event is published once on the event bus; each worker's manager
+        receives it through deliver_event and fans it out to its own sockets.
+        """
+        await event_bus.publish(USER_EVENTS, event)
+
+    async def broadcast_events(self, events: List[Dict[str, Any]]):
         """
-        for sub in list(self.active):
-            try:
-                match = False
-
-                # Check for ID-based subscription match
-                if sub.by_id is not None and event["user"]["id"] == sub.by_id:
-                    match = True
-
-                # Check for search-based subscription match
-                if sub.search is not None:
-                    # Verify all filters match the event data (case-insensitive)
-                    match = all(
-                        str(event["user"].get(k, "")).lower().find(str(v).lower()) >= 0
-                        for k, v in sub.search.items()
-                    )
-
-                # Send event to matching subscribers
-                if match:
-                    await sub.ws.send_text(json.dumps(event))
-            except:
-                # Clean up failed connections
-                self.disconnect(sub.ws)
+        Broadcast the events of one bulk write as batched bus messages
+        ({"type": "batch", "events": [...]}), split only as needed to fit a NOTIFY payload.
+        Each subscriber receives a bus message's matching events as one batch frame.
+        """
+        for chunk in chunk_for_notify(events):
+            await event_bus.publish(USER_EVENTS, {"type": "batch", "events": chunk})
+
+    async def deliver_event(self, payload: Dict[str, Any]):
+        """Fan events received from the bus out to this worker's matching subscribers."""
+        started = time.perf_counter()
+        if payload["type"] == "batch":
+            self._deliver_batch(user_events(payload))
+        else:
+            self._deliver(payload)
+        self.last_broadcast_seconds = time.perf_counter() - started
+        broadcast_duration.observe(self.last_broadcast_seconds, "immediate")
+
+    def _deliver(self, event: Dict[str, Any]):
+        message = None
+        for sub in self._match(event["user"]):
+            if sub.batched:
+                continue
+            if message is None:
+                message = json.dumps(event)
+            self._enqueue(sub, message)
+        self._hold(event)
+
+    def _deliver_batch(self, events: List[Dict[str, Any]]):
+        # A bulk write's events go out as one frame per subscriber: one message per event
+        # would overflow the send queues before any writer got to run
+        per_sub: Dict[Subscription, list] = {}
+        for index, event in enumerate(events):
+            for sub in self._match(event["user"]):
+                if not sub.batched:
+                    per_sub.setdefault(sub, []).append(index)
+            self._hold(event)
+        self._enqueue_batches(per_sub, events)
+
+    def _hold(self, event: Dict[str, Any]):
+        if self.batched:
+            # Keep only the latest event per user until the window closes; a stale event (lower
+            # row version, published late by another worker) doesn't replace a newer one
+            user_id = event["user"]["id"]
+            held = self._pending.get(user_id)
+            if held is None or event.get("version", 0) >= held.get("version", 0):
+                self._pending[user_id] = event
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_after_window())
+
+    def _match(self, user: Dict[str, Any]) -> list:
+        # Search subscriptions are decided by their filters; ID-only ones by the id index
+        matched = self.searching.match(user)
+        matched.extend(
+            sub for sub in self.by_id.get(user["id"], ())
+            if sub.search is None
+        )
+        return matched
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.batch_window)
+        pending, self._pending = self._pending, {}
+        self._flush_task = None
+        started = time.perf_counter()
+
+        # user ids (in arrival order) each batched subscription should receive
+        per_sub: Dict[Subscription, list] = {}
+        for user_id, event in pending.items():
+            for sub in self._match(event["user"]):
+                if sub.batched:
+                    per_sub.setdefault(sub, []).append(user_id)
+
+        self._enqueue_batches(per_sub, pending)
+        broadcast_duration.observe(time.perf_counter() - started, "batched")
+
+    def _enqueue_batches(self, per_sub: Dict[Subscription, list], events):
+        # Queue {"type": "batch"} frames of events[key] for each subscription's keys, serializing
+        # each event once, and each distinct batch once for all its recipients
+        serialized: Dict[Any, str] = {}
+        frames: Dict[tuple, str] = {}
+        for sub, keys in per_sub.items():
+            batch = tuple(keys)
+            frame = frames.get(batch)
+            if frame is None:
+                for key in keys:
+                    if key not in serialized:
+                        serialized[key] = json.dumps(events[key])
+                frame = frames[batch] = '{"type": "batch", "events": [' + ", ".join(serialized[k] for k in keys) + ']}'
+            self._enqueue(sub, frame)
+
+    def _enqueue(self, sub: Subscription, message: str):
+        try:
+            sub.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            sub.dropped += 1
+            if self.slow_consumer_policy == "drop":
+                # Keep the connection, skip the event and tell the client once it catches up
+                sub.lagging = True
+                return
+            logger.warning("Disconnecting slow WebSocket consumer ({} queued)", sub.queue.qsize())
+            self.disconnect(sub.ws)
+            asyncio.create_task(self._close(sub.ws, SLOW_CONSUMER_CLOSE_CODE))
+
+    async def _write_loop(self, sub: Subscription):
+        try:
+            while True:
+                message = await sub.queue.get()
+                await sub.ws.send_text(message)
+                if sub.lagging and sub.queue.empty():
+                    sub.lagging = False
+                    await sub.ws.send_text(json.dumps({"type": "lagged", "dropped": sub.dropped}))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Clean up failed connections
+            self.disconnect(sub.ws)
+
+    @staticmethod
+    async def _close(ws: WebSocket, code: int):
+        try:
+            await ws.close(code=code)
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "connections": len(self.connections),
+            "id_subscriptions": sum(len(subs) for subs in self.by_id.values()),
+            "search_subscriptions": len(self.searching),
+            "batched": len(self.batched),
+            "lagging": sum(1 for sub in self.connections.values() if sub.lagging),
+            "last_broadcast_seconds": self.last_broadcast_seconds,
+        }
 
 manager = ConnectionManager()
+event_bus.subscribe(USER_EVENTS, manager.deliver_event)
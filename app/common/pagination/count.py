@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from sqlalchemy import Table, text
+from sqlalchemy.orm import Session
+
+from app.common.config.config import FromSettings
+from app.common.notifications.bus import USER_EVENTS, event_bus, user_events
+
+# How `total` is computed for paginated responses (settings.count_strategy):
+#   exact     COUNT(*) on every request
+#   cached    COUNT(*) cached per filter set for count_cache_ttl_seconds, dropped by user events
+#   estimate  the planner's row estimate: pg_class.reltuples unfiltered, EXPLAIN otherwise
+#   none      no total; pages report has_next only
+
+
+class CountCache:
+    """
+    In-process TTL cache of exact row counts, keyed by the query's filters as a
+    tuple of (name, value) pairs; the empty tuple is the unfiltered count.
+
+    Creates and deletes (from any worker, through the event bus) drop every entry;
+    updates drop only the filtered ones, since they can't change the table size.
+    """
+    ttl_seconds = FromSettings("count_cache_ttl_seconds")
+    max_size = 1024
+
+    def __init__(self, ttl_seconds: float | None = None):
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[Hashable, tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so counts that raced with a write aren't cached
+        self._epoch = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+
+    def get(self, key: Hashable) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, count: int, epoch: int) -> None:
+        """Cache a count computed when the cache was at `epoch`; ignored if a write happened since."""
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._entries[key] = (count, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, filtered_only: bool = False) -> None:
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += 1
+            if filtered_only:
+                self._entries = OrderedDict((k, v) for k, v in self._entries.items() if not k)
+            else:
+                self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+# Row count of a whole table from the planner statistics; None if it was never analyzed
+def table_estimate(db: Session, table: Table) -> Optional[int]:
+    estimate = db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+        {"table": table.name},
+    ).scalar()
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+# Rows the planner expects `stmt` to return, from EXPLAIN (no rows are read)
+def planner_estimate(db: Session, stmt) -> int:
+    connection = db.connection()
+    compiled = stmt.compile(dialect=connection.dialect)
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+count_cache = CountCache()
+
+
+# Drop cached counts whenever users are created, updated or deleted in any worker
+async def invalidate_on_user_event(payload: dict) -> None:
+    types = {event["type"] for event in user_events(payload)}
+    if types - {"updated"}:
+        count_cache.invalidate()
+    elif types:
+        count_cache.invalidate(filtered_only=True)
+
+
+event_bus.subscribe(USER_EVENTS, invalidate_on_user_event)
@@ -0,0 +1,30 @@
+import base64
+import binascii
+
+from app.common.errors.errors import InvalidCursor
+
+# Encode non-negative integers (e.g. the last seen primary key) into an opaque, URL-safe cursor
+def encode_cursor_values(*values: int) -> str:
+    return base64.urlsafe_b64encode(":".join(map(str, values)).encode()).rstrip(b"=").decode()
+
+
+# Decode a cursor produced by encode_cursor_values back into its `count` integers
+def decode_cursor_values(cursor: str, count: int) -> tuple[int, ...]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = tuple(int(part) for part in base64.urlsafe_b64decode(padded.encode()).decode().split(":"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor()
+    if len(values) != count or any(value < 0 for value in values):
+        raise InvalidCursor()
+    return values
+
+
+# Encode the last seen primary key into an opaque, URL-safe cursor
+def encode_cursor(last_id: int) -> str:
+    return encode_cursor_values(last_id)
+
+
+# Decode a cursor produced by encode_cursor back into the last seen primary key
+def decode_cursor(cursor: str) -> int:
+    return decode_cursor_values(cursor, 1)[0]
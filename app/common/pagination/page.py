@@ -0,0 +1,16 @@
+import math
+from typing import Any, Optional
+
+from fastapi_pagination import Params
+
+# Build the JSON body of a UserPage without validating each item; `total` (and so `pages`)
+# is None when the count strategy skips counting, `has_next` is always exact
+def page_content(items: list[Any], total: Optional[int], params: Params, has_next: bool) -> dict[str, Any]:
+    return {
+        "items": items,
+        "total": total,
+        "page": params.page,
+        "size": params.size,
+        "pages": (math.ceil(total / params.size) if params.size else 0) if total is not None else None,
+        "has_next": has_next,
+    }
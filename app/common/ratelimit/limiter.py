@@ -0,0 +1,166 @@
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Tuple
+
+from fastapi import Request
+from loguru import logger
+
+from app.common.config.config import settings
+from app.common.errors.errors import RateLimited
+from app.modules.auth.token.token import decode_access_token_cached
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process file locks, fall back to per-process buckets
+    fcntl = None
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Parse "100/minute" into (bucket capacity, refill rate in tokens per second)
+def parse_rate(rate: str) -> Tuple[float, float]:
+    amount, _, period = rate.partition("/")
+    capacity = float(amount)
+    return capacity, capacity / PERIODS[period.strip().rstrip("s")]
+
+
+# Refill a bucket and try to take one token; returns (tokens left, retry_after or 0)
+def _take(tokens: float, updated: float, now: float, capacity: float, refill: float) -> Tuple[float, float]:
+    tokens = min(capacity, tokens + (now - updated) * refill)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / refill
+
+
+class MemoryBucketStore:
+    """Token buckets in process memory; limits are per worker."""
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, refill: float) -> float:
+        """Take one token from `key`'s bucket; returns 0 if allowed, else seconds to wait."""
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens, retry_after = _take(tokens, updated, now, capacity, refill)
+            self._buckets[key] = (tokens, now)
+        return retry_after
+
+
+class SharedBucketStore:
+    """
+    Token buckets in a memory-mapped file shared by every worker on the host.
+
+    The file is a fixed table of slots (key hash, tokens, last refill time). A key
+    lives in one of PROBE slots after its home slot; taking a token locks only
+    that byte range with fcntl, so the cost per request is O(1) and independent
+    of the number of keys or workers. When every probe slot is taken by other
+    keys, the least recently used one is recycled.
+    """
+    SLOT = struct.Struct("<Qdd")
+    PROBE = 8
+
+    def __init__(self, path: str, slots: int):
+        self.slots = slots
+        size = (slots + self.PROBE) * self.SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        # fcntl locks don't exclude threads of the same process
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # Stable across processes (unlike hash()); 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def take(self, key: str, capacity: float, refill: float) -> float:
+        """Take one token from `key`'s bucket; returns 0 if allowed, else seconds to wait."""
+        key_hash = self._hash(key)
+        home = key_hash % self.slots
+        start, length = home * self.SLOT.size, self.PROBE * self.SLOT.size
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start, os.SEEK_SET)
+            try:
+                now = time.time()
+                # A fresh bucket goes to the first empty slot, or replaces the least recently used one
+                target, tokens, updated = None, capacity, now
+                oldest, oldest_updated = start, float("inf")
+                for offset in range(start, start + length, self.SLOT.size):
+                    slot_hash, slot_tokens, slot_updated = self.SLOT.unpack_from(self._map, offset)
+                    if slot_hash == key_hash:
+                        target, tokens, updated = offset, slot_tokens, slot_updated
+                        break
+                    if slot_hash == 0:
+                        target = offset
+                        break
+                    if slot_updated < oldest_updated:
+                        oldest, oldest_updated = offset, slot_updated
+                if target is None:
+                    target = oldest
+                tokens, retry_after = _take(tokens, updated, now, capacity, refill)
+                self.SLOT.pack_into(self._map, target, key_hash, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start, os.SEEK_SET)
+        return retry_after
+
+
+# Build the bucket store selected by settings.rate_limit_backend
+def create_bucket_store():
+    if settings.rate_limit_backend == "shared":
+        if fcntl is not None:
+            return SharedBucketStore(settings.rate_limit_store_path, settings.rate_limit_slots)
+        logger.warning("Shared rate limiting needs fcntl; falling back to per-process buckets")
+    return MemoryBucketStore()
+
+
+_store = None
+
+def get_bucket_store():
+    # Opened on first use so importing the module has no side effects
+    global _store
+    if _store is None:
+        _store = create_bucket_store()
+    return _store
+
+
+# Identify the caller by user id from the bearer token, or by client IP when unauthenticated
+def principal_key(request: Request) -> str:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            user_id = decode_access_token_cached(token).get("user_id")
+            if user_id is not None:
+                return f"user:{user_id}"
+        except Exception:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def rate_limit(rate: str, per: str = "principal"):
+    """
+    Dependency enforcing a token-bucket limit such as "100/minute" for a route.
+
+    Buckets are keyed by route and by caller: `per="principal"` uses the
+    authenticated user id (falling back to the client IP), `per="ip"` the client IP.
+    """
+    capacity, refill = parse_rate(rate)
+
+    async def dep(request: Request):
+        if not settings.rate_limit_enabled:
+            return
+        route = request.scope.get("route")
+        route_key = f"{request.method}:{route.path if route is not None else request.url.path}"
+        if per == "ip":
+            caller = f"ip:{request.client.host if request.client else 'unknown'}"
+        else:
+            caller = principal_key(request)
+        retry_after = get_bucket_store().take(f"{route_key}:{caller}", capacity, refill)
+        if retry_after:
+            raise RateLimited(retry_after)
+    return dep
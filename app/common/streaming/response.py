@@ -0,0 +1,40 @@
+import zlib
+from contextlib import aclosing
+from typing import AsyncIterator
+
+from fastapi import Request
+from starlette.responses import StreamingResponse
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that always closes its body iterator.
+
+    When the client disconnects, Starlette cancels the response while the iterator
+    is suspended and leaves it to garbage collection. Closing it here runs the
+    iterator's cleanup (e.g. releasing a DB connection) as soon as the response ends.
+    """
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+
+
+# True when the client accepts a gzip-encoded response
+def accepts_gzip(request: Request) -> bool:
+    return any(
+        coding.split(";")[0].strip().lower() == "gzip"
+        for coding in request.headers.get("accept-encoding", "").split(",")
+    )
+
+
+# Gzip a stream of chunks on the fly; each chunk is flushed so the client receives data as it is produced
+async def gzip_stream(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+    yield compressor.flush()
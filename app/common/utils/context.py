@@ -0,0 +1,64 @@
+import re
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+# Incoming X-Request-ID values are reused only when they look like an id
+_VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+
+class RequestContext:
+    """Per-request state read by the log patcher and the route level/sampling filter."""
+    __slots__ = ("request_id", "method", "scope", "log_decision")
+
+    def __init__(self, request_id: str, method: str, scope: dict):
+        self.request_id = request_id
+        self.method = method
+        self.scope = scope
+        # (minimum level number, sampled) for this request, decided on the first log call
+        self.log_decision: Optional[tuple[int, bool]] = None
+
+    @property
+    def route(self) -> Optional[str]:
+        # The router stores the matched route in the scope, so this is known once routing is done
+        route = self.scope.get("route")
+        return getattr(route, "path", None)
+
+
+# Set by RequestContextMiddleware for the duration of each HTTP request or WebSocket connection
+request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware giving every request an id for log correlation.
+
+    The id comes from the X-Request-ID header when the client sends a valid one,
+    otherwise it is generated, and it is echoed back in the response headers.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None or not _VALID_REQUEST_ID.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode())]
+            await send(message)
+
+        token = request_context.set(RequestContext(request_id, scope.get("method", "WS"), scope))
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_context.reset(token)
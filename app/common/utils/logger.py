@@ -1,14 +1,178 @@
-from loguru import logger
+import atexit
+import queue
+import random
 import sys
+import threading
+import traceback
+from typing import Dict, Optional, TextIO
+
+import orjson
+from loguru import logger
+
+from app.common.config.config import settings
+from app.common.utils.context import request_context
+
+TEXT_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
+    "<level>{level: <8}</level> | "
+    "<cyan>{module}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> | "
+    "{extra[request_id]} - {message}"
+)
+
+# Records at or above this level are never sampled out
+WARNING_NO = logger.level("WARNING").no
+
+# Filter state, set by configure_logging
+_default_level_no = logger.level("INFO").no
+_route_levels: Dict[str, int] = {}
+_route_sample_rates: Dict[str, float] = {}
+_writer: Optional["BackgroundWriter"] = None
+
+
+class BackgroundWriter:
+    """
+    File-like sink that hands formatted lines to a thread writing them to `stream`.
+
+    loguru's own enqueue=True pickles every record through a multiprocessing pipe,
+    which costs more per record than the write it avoids. Here a line only goes
+    through an in-process queue. When the queue is full (the stream can't keep up),
+    lines are dropped and counted instead of blocking the request.
+    """
+    def __init__(self, stream: TextIO, max_queue: int):
+        self.stream = stream
+        self.queue: queue.Queue = queue.Queue(max_queue)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        # Write out what is still queued when the interpreter exits
+        atexit.register(self.stop)
+
+    def write(self, message: str) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            lines = [self.queue.get()]
+            # Write whatever else is already queued in one go
+            while len(lines) < 1000:
+                try:
+                    lines.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = lines[-1] is None
+            text = "".join(line for line in lines if line is not None)
+            try:
+                if text:
+                    self.stream.write(text)
+                    self.stream.flush()
+            except Exception:
+                pass
+            if stop:
+                return
+
+    def stop(self) -> None:
+        # Called by loguru when the handler is removed
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
+        atexit.unregister(self.stop)
+
+    def stats(self) -> dict:
+        return {"queued": self.queue.qsize(), "dropped": self.dropped}
+
+
+# Queue statistics of the background log writer (empty when logging is synchronous)
+def log_writer_stats() -> dict:
+    return _writer.stats() if _writer is not None else {}
+
+
+# Copy the current request's id, method and route (if any) onto every record
+def _add_request_context(record) -> None:
+    ctx = request_context.get()
+    if ctx is not None:
+        extra = record["extra"]
+        extra["request_id"] = ctx.request_id
+        extra["method"] = ctx.method
+        extra["route"] = ctx.route
+
+
+# Apply the per-route minimum level and sample rate; a request is sampled in or out as a whole
+def _route_filter(record) -> bool:
+    ctx = request_context.get()
+    if ctx is None:
+        return record["level"].no >= _default_level_no
+    if ctx.log_decision is None:
+        route = ctx.route
+        if route is None:
+            # Not routed yet (or no matching route): don't cache, decide again once routing is done
+            return record["level"].no >= _default_level_no
+        rate = _route_sample_rates.get(route, 1.0)
+        ctx.log_decision = (_route_levels.get(route, _default_level_no), rate >= 1.0 or random.random() < rate)
+    min_level, sampled = ctx.log_decision
+    level = record["level"].no
+    return level >= min_level and (sampled or level >= WARNING_NO)
+
+
+# One JSON object per line; built in the format callback so only the sink write is left to the queue
+def _json_format(record) -> str:
+    payload = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "logger": f"{record['name']}:{record['function']}:{record['line']}",
+        **record["extra"],
+    }
+    if record["exception"] is not None:
+        payload["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    record["extra"]["_json"] = orjson.dumps(payload, default=str).decode()
+    return "{extra[_json]}\n"
+
+
+def configure_logging(
+    sink: TextIO = sys.stdout,
+    level: Optional[str] = None,
+    json: Optional[bool] = None,
+    enqueue: Optional[bool] = None,
+    queue_size: Optional[int] = None,
+    diagnose: Optional[bool] = None,
+    route_levels: Optional[Dict[str, str]] = None,
+    route_sample_rates: Optional[Dict[str, float]] = None,
+) -> None:
+    """
+    Replace loguru's handlers with the service's single sink.
+
+    Arguments left as None come from the settings. With `enqueue` the sink is written
+    from a background thread, so a slow stdout doesn't add to request latency.
+    `diagnose` (variable values in tracebacks) follows `debug` by default, because it
+    can leak secrets into production logs.
+    """
+    global _default_level_no, _route_levels, _route_sample_rates, _writer
+    level = level or settings.log_level
+    json = settings.log_format == "json" if json is None else json
+    enqueue = settings.log_enqueue if enqueue is None else enqueue
+    queue_size = queue_size or settings.log_queue_size
+    diagnose = settings.debug if diagnose is None else diagnose
+    route_levels = settings.log_route_levels if route_levels is None else route_levels
+    route_sample_rates = settings.log_route_sample_rates if route_sample_rates is None else route_sample_rates
+
+    _default_level_no = logger.level(level.upper()).no
+    _route_levels = {route: logger.level(name.upper()).no for route, name in route_levels.items()}
+    _route_sample_rates = dict(route_sample_rates)
 
-logger.remove()
-logger.add(
-    sys.stdout,
-    level="INFO",
-    format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
-           "<level>{level: <8}</level> | "
-           "<cyan>{module}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
-           "{message}",
-    backtrace=True,
-    diagnose=True,
-)
\ No newline at end of file
+    logger.remove()
+    _writer = BackgroundWriter(sink, queue_size) if enqueue else None
+    logger.configure(extra={"request_id": "-"}, patcher=_add_request_context)
+    logger.add(
+        _writer or sink,
+        # The handler accepts the lowest configured level; _route_filter enforces the rest.
+        # Calls below it return before formatting their arguments.
+        level=min([_default_level_no, *_route_levels.values()]),
+        format=_json_format if json else TEXT_FORMAT,
+        filter=_route_filter,
+        colorize=False if json or enqueue else None,
+        backtrace=diagnose,
+        diagnose=diagnose,
+    )
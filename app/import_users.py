@@ -1,56 +1,179 @@
+"""
+Bulk import users from a CSV file into the database.
+
+The CSV is streamed in chunks, each chunk is written with one multi-row
+INSERT ... ON CONFLICT (email) DO NOTHING, and progress is checkpointed after
+every committed chunk so an interrupted import resumes where it stopped.
+
+Rows without a `password` column share one precomputed bcrypt hash of the
+default password; per-row passwords are hashed in parallel across cores.
+
+    python -m app.import_users [--csv PATH] [--chunk-size N] [--restart]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
-import psycopg2
-from sqlalchemy.orm import Session
-from app.common.db.session import SessionLocal,engine
-from app.common.db.base    import Base
-from app.models.userModel import User
-from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
 
+from app.common.db.base import Base
+from app.common.db.session import engine
+from app.models.userModel import User
+import app.models.userChangeModel  # noqa: F401  (registers the change log tables on Base.metadata)
 from app.modules.auth.token.token import hash_password
+from app.modules.users.changes.changeLog import CREATED, record_changes
+from app.modules.users.repositories.usersRepo import USER_OUT_COLUMNS
+from app.modules.users.schemas.userSchema import RoleEnum
 
 CSV_FILE_PATH = "./app/mock_data.csv"
+CHECKPOINT_PATH = "./app/.import_users.checkpoint"
 DEFAULT_PLAIN_PASSWORD = "ChangeMe123!"
+DEFAULT_CHUNK_SIZE = 5_000
+# Passwords handed to each hashing process at a time
+HASH_BATCH_SIZE = 64
+
+USER_COLUMNS = ["first_name", "last_name", "email", "gender", "ip_address"]
+
+
+# Read how many CSV rows a previous run already committed
+def load_checkpoint(path: str) -> int:
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+# Atomically record how many CSV rows have been committed
+def save_checkpoint(path: str, rows_done: int) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(rows_done))
+    os.replace(tmp_path, path)
+
+
+# Hash the passwords of one chunk; rows without their own password reuse the shared hash
+def hash_chunk_passwords(chunk: pd.DataFrame, shared_hash: str, pool: ProcessPoolExecutor | None) -> list[str]:
+    if "password" not in chunk.columns or pool is None:
+        return [shared_hash] * len(chunk)
+    passwords = chunk["password"].tolist()
+    to_hash = [p for p in passwords if p]
+    hashed = iter(pool.map(hash_password, to_hash, chunksize=HASH_BATCH_SIZE))
+    return [next(hashed) if p else shared_hash for p in passwords]
 
-#Import users from CSV file to the database
-def import_users():
-    # Recreate tables in dev
-    Base.metadata.drop_all(bind=engine)
+
+# Insert one chunk, and its change log entries, in a single transaction; returns the emails that already existed
+def insert_chunk(rows: list[dict]) -> list[str]:
+    stmt = (
+        pg_insert(User)
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(*USER_OUT_COLUMNS)
+    )
+    with engine.begin() as conn:
+        created = [dict(row) for row in conn.execute(stmt, rows).mappings()]
+        record_changes(conn, CREATED, created)
+    inserted = {user["email"] for user in created}
+    duplicates = []
+    for row in rows:
+        # The first occurrence of an inserted email wins; repeats within the chunk are duplicates too
+        if row["email"] in inserted:
+            inserted.discard(row["email"])
+        else:
+            duplicates.append(row["email"])
+    return duplicates
+
+
+# Import users from CSV file to the database
+def import_users(
+    csv_path: str = CSV_FILE_PATH,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    checkpoint_path: str = CHECKPOINT_PATH,
+    restart: bool = False,
+    workers: int | None = None,
+    duplicates_path: str | None = None,
+) -> None:
+    # Only creates what is missing; existing users are kept
     Base.metadata.create_all(bind=engine)
 
-    df = pd.read_csv(CSV_FILE_PATH)
-    db: Session = SessionLocal()
-
-    for _, row in df.iterrows():
-        # build the ORM model args
-        user = User(
-            first_name      = row["first_name"],
-            last_name       = row["last_name"],
-            email           = row["email"],
-            gender          = row["gender"],
-            ip_address      = row["ip_address"],
-            role            = "user",
-            hashed_password = hash_password(DEFAULT_PLAIN_PASSWORD),
-        )
-        try:
-            db.add(user)
-            db.commit()
-            print(f"Imported: {user.email} (id={user.id})")
-        except IntegrityError as e:
-            db.rollback()
-            # psycopg2 error codes: UNIQUE_VIOLATION is '23505'
-            pgcode = getattr(e.orig, 'pgcode', None)
-            if pgcode == psycopg2.errorcodes.UNIQUE_VIOLATION:
-                print(f"[Duplicate] {row['email']}")
-            else:
-                print(f"[IntegrityError:{pgcode}] inserting {row['email']}: {e.orig}")
-        except SQLAlchemyError as e:
-            db.rollback()
-            print(f"[SQLAlchemyError] {row['email']}: {e}")
-        except Exception as e:
-            db.rollback()
-            print(f"[Exception] {row['email']}: {e}")
-
-    db.close()
+    rows_done = 0 if restart else load_checkpoint(checkpoint_path)
+    if rows_done:
+        print(f"Resuming after {rows_done} rows (checkpoint {checkpoint_path})")
+
+    header = pd.read_csv(csv_path, nrows=0).columns
+    shared_hash = hash_password(DEFAULT_PLAIN_PASSWORD)
+    pool = ProcessPoolExecutor(max_workers=workers) if "password" in header else None
+
+    reader = pd.read_csv(
+        csv_path,
+        chunksize=chunk_size,
+        dtype=str,
+        keep_default_na=False,
+        skiprows=lambda i: 0 < i <= rows_done,
+    )
+
+    imported = duplicates = 0
+    duplicate_emails: list[str] = []
+    started = time.perf_counter()
+    try:
+        for chunk in reader:
+            hashes = hash_chunk_passwords(chunk, shared_hash, pool)
+            rows = [
+                {**record, "role": RoleEnum.user, "hashed_password": hashed}
+                for record, hashed in zip(chunk[USER_COLUMNS].to_dict("records"), hashes)
+            ]
+            try:
+                chunk_duplicates = insert_chunk(rows)
+            except SQLAlchemyError as e:
+                print(f"[SQLAlchemyError] chunk starting at row {rows_done + 1}: {e}")
+                raise
+
+            rows_done += len(rows)
+            imported += len(rows) - len(chunk_duplicates)
+            duplicates += len(chunk_duplicates)
+            duplicate_emails.extend(chunk_duplicates)
+            save_checkpoint(checkpoint_path, rows_done)
+
+            elapsed = time.perf_counter() - started
+            print(
+                f"Imported {imported} users, {duplicates} duplicates "
+                f"({rows_done} rows processed, {(imported + duplicates) / elapsed:,.0f} rows/sec)"
+            )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if duplicate_emails:
+        print(f"[Duplicate] {len(duplicate_emails)} emails already existed")
+        if duplicates_path:
+            with open(duplicates_path, "w") as f:
+                f.write("\n".join(duplicate_emails) + "\n")
+            print(f"[Duplicate] list written to {duplicates_path}")
+
+    elapsed = time.perf_counter() - started
+    print(f"Done: {imported} imported, {duplicates} duplicates in {elapsed:.1f}s")
+    # The file is fully imported; a fresh run should start from the top again
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
 
 if __name__ == "__main__":
-    import_users()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=CSV_FILE_PATH, help="CSV file to import")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per INSERT/transaction")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, help="file recording committed rows")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first row")
+    parser.add_argument("--workers", type=int, default=None, help="hashing processes for per-row passwords")
+    parser.add_argument("--duplicates", default=None, help="write duplicate emails to this file")
+    args = parser.parse_args()
+
+    import_users(
+        csv_path=args.csv,
+        chunk_size=args.chunk_size,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+        workers=args.workers,
+        duplicates_path=args.duplicates,
+    )
@@ -1,36 +1,72 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi_pagination import add_pagination
-from slowapi import Limiter
-from app.common.config.config import settings
-from app.common.db.base import Base
-from app.common.db.session import engine
+from app.common.config.config import get_settings
+from app.common.db.replicas import ReadYourWritesMiddleware, replica_set
+from app.common.db.session import dispose_engines, get_async_engine, get_engine, get_replica_engines
 from app.modules.users.routes.v1.users import router as users_router
 from app.modules.auth.routes.v1.authRoutes import router as auth_router
 from sqlalchemy.exc import IntegrityError
 from app.common.errors.errors import EntityNotFound, DuplicateEntity
-import app.common.utils.logger as logger
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from slowapi import Limiter, _rate_limit_exceeded_handler
+from app.common.notifications.bus import event_bus
+from app.modules.auth.token.passwordHasher import password_hasher
+from app.modules.auth.token.tokenVersions import refresh_periodically, sync_token_versions
+from app.modules.users.search.trigramIndex import build_search_index
+from app.modules.users.changes.changeLog import compact_periodically
+from app.common.metrics.middleware import MetricsMiddleware
+from app.common.metrics.routes import router as metrics_router
+from app.common.utils.context import RequestContextMiddleware
+from app.common.utils.logger import configure_logging
 
-limiter = Limiter(key_func=get_remote_address)
+# The schema is no longer created here; run `python -m app.common.db.migrate` before starting the app.
 
-# Create tables
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(
-    title=settings.app_name,
-    debug=settings.debug,
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    # Create the engines (and their pools) once the worker is actually starting
+    get_engine()
+    get_async_engine()
+    replicas = get_replica_engines()
 
+    # Warm the token revocation map so stateless auth rejects tokens revoked (or users deleted) before a
+    # restart, and keep re-reading deletes in case this worker misses one's bus message
+    if settings.stateless_auth:
+        sync_token_versions(initial=True)
+        app.state.token_revocation_refresh = asyncio.create_task(refresh_periodically(settings.token_revocation_refresh_seconds))
+
+    # Start the cross-worker event bus (user events, token revocations)
+    await event_bus.start()
+
+    # Build the in-memory search index in the background; /search uses Postgres until it is ready
+    if settings.search_index_enabled:
+        app.state.search_index_build = asyncio.create_task(build_search_index())
+
+    # Keep checking replica health and lag; the first check runs right away
+    if replicas:
+        app.state.replica_monitor = asyncio.create_task(replica_set.monitor(replicas, settings.replica_check_seconds))
+
+    # Compact the change log behind /users/changes; only one worker at a time actually does it
+    if settings.change_log_compact_interval_seconds > 0:
+        app.state.change_log_compaction = asyncio.create_task(compact_periodically(settings.change_log_compact_interval_seconds))
+
+    yield
+
+    if settings.change_log_compact_interval_seconds > 0:
+        app.state.change_log_compaction.cancel()
+    if settings.stateless_auth:
+        app.state.token_revocation_refresh.cancel()
+    if replicas:
+        app.state.replica_monitor.cancel()
+    # Release the event bus, pooled connections and hashing workers on shutdown
+    await event_bus.stop()
+    await dispose_engines()
+    password_hasher.shutdown()
 
-# Register the exception handler
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 # Exception handlers
-@app.exception_handler(IntegrityError)
 async def sqlalchemy_integrity_error_handler(request: Request, exc: IntegrityError):
     # Handle unique constraint violations
     detail = str(exc.orig)
@@ -39,14 +75,12 @@ async def sqlalchemy_integrity_error_handler(request: Request, exc: IntegrityErr
         content={"detail": detail}
     )
 
-@app.exception_handler(EntityNotFound)
 async def entity_not_found_handler(request: Request, exc: EntityNotFound):
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail}
     )
 
-@app.exception_handler(DuplicateEntity)
 async def duplicate_entity_handler(request: Request, exc: DuplicateEntity):
     return JSONResponse(
         status_code=exc.status_code,
@@ -54,18 +88,42 @@ async def duplicate_entity_handler(request: Request, exc: DuplicateEntity):
     )
 
 
-# Include module routers
-app.include_router(
-    auth_router,
-    prefix="/api/v1/auth",
-    tags=["Auth"],
-)
+# Application factory; run with `uvicorn app.main:create_app --factory`
+def create_app() -> FastAPI:
+    settings = get_settings()
+    configure_logging()
+    app = FastAPI(
+        title=settings.app_name,
+        debug=settings.debug,
+        lifespan=lifespan,
+    )
+
+    app.add_exception_handler(IntegrityError, sqlalchemy_integrity_error_handler)
+    app.add_exception_handler(EntityNotFound, entity_not_found_handler)
+    app.add_exception_handler(DuplicateEntity, duplicate_entity_handler)
+
+    # Include module routers
+    app.include_router(
+        auth_router,
+        prefix="/api/v1/auth",
+        tags=["Auth"],
+    )
+
+    app.include_router(
+        users_router,
+        prefix="/api/v1/users",
+        tags=["Users"],
+    )
 
-app.include_router(
-    users_router,
-    prefix="/api/v1/users",
-    tags=["Users"],
-)
+    # Prometheus metrics for this worker
+    app.include_router(metrics_router, tags=["Metrics"])
+    app.add_middleware(MetricsMiddleware)
+    # Reads after a caller's own write go to the primary
+    if settings.database_replica_urls:
+        app.add_middleware(ReadYourWritesMiddleware)
+    # Outermost, so every log record of a request carries its id
+    app.add_middleware(RequestContextMiddleware)
 
-# Enable pagination
-add_pagination(app)
\ No newline at end of file
+    # Enable pagination
+    add_pagination(app)
+    return app
@@ -0,0 +1,43 @@
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, func, text
+from sqlalchemy.dialects.postgresql import JSONB
+from app.common.db.base import Base
+
+class UserChange(Base):
+    """SQLAlchemy model for the user change log (user_changes table).
+
+    One row per created, updated or deleted user, written in the same transaction
+    as the change itself. The log is ordered by (txid, seq): `txid` is the writing
+    transaction's id (or a later one, see changeLog) and `seq` orders
+    the entries of one transaction. Deletes are tombstones without data.
+    Backs the incremental GET /users/changes feed.
+    """
+    __tablename__ = "user_changes"
+
+    seq        = Column(BigInteger, primary_key=True)
+    txid       = Column(BigInteger, server_default=text("pg_current_xact_id()::text::bigint"), nullable=False)
+    user_id    = Column(Integer, nullable=False)
+    type       = Column(String(16), nullable=False)
+    # UserOut columns after the change; NULL for tombstones
+    data       = Column(JSONB, nullable=True)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    # Compaction looks for newer entries of the same user; feeds read in (txid, seq) order
+    __table_args__ = (
+        Index("ix_user_changes_user_seq", "user_id", "seq"),
+        Index("ix_user_changes_txid_seq", "txid", "seq"),
+    )
+
+
+class UserChangeCompaction(Base):
+    """SQLAlchemy model recording each compaction of the user change log.
+
+    (`horizon_txid`, `horizon_seq`) is the highest log position whose tombstone was
+    removed; feeds resuming from an older cursor may have missed deletes and must resync.
+    """
+    __tablename__ = "user_change_compactions"
+
+    id           = Column(Integer, primary_key=True)
+    compacted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    horizon_txid = Column(BigInteger, server_default="0", nullable=False)
+    horizon_seq  = Column(BigInteger, nullable=False)
+    removed      = Column(Integer, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Index, Enum as SQLEnum
+from sqlalchemy import DDL, Column, DateTime, Integer, String, Index, Enum as SQLEnum, event, func
 from app.common.db.base import Base
 from app.modules.users.schemas.userSchema import RoleEnum
 
@@ -6,7 +6,8 @@ class User(Base):
     """SQLAlchemy User model for users table.
 
     Stores user data including personal info, auth details, and role.
-    Includes composite index on name fields and unique email constraint.
+    Includes composite index on name fields, unique email constraint and
+    pg_trgm GIN indexes backing the substring (ILIKE '%...%') search filters.
     """
     __tablename__ = "users"
 
@@ -18,9 +19,25 @@ class User(Base):
     ip_address = Column(String, index=True, nullable=False)
     hashed_password = Column(String, nullable=False) 
     role            = Column(SQLEnum(RoleEnum), default=RoleEnum.user, nullable=False, index=True)
+    # Bumped to revoke previously issued access tokens (e.g. on role change)
+    token_version   = Column(Integer, default=0, server_default="0", nullable=False)
+    # Row version and modification time, bumped by every update; they back the ETag / Last-Modified headers
+    version    = Column(Integer, default=1, server_default="1", nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     # A composite index as first name and last name will be mostly used together
     __table_args__ = (
         Index("ix_users_name", "first_name", "last_name"),
+        # Trigram indexes so leading-wildcard ILIKE searches don't fall back to a sequential scan
+        Index("ix_users_first_name_trgm", "first_name", postgresql_using="gin", postgresql_ops={"first_name": "gin_trgm_ops"}),
+        Index("ix_users_last_name_trgm", "last_name", postgresql_using="gin", postgresql_ops={"last_name": "gin_trgm_ops"}),
+        Index("ix_users_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
     )
 
+
+# The trigram operator classes live in the pg_trgm extension, which must exist before the indexes
+event.listen(
+    User.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"),
+)
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, EmailStr
+from app.modules.users.schemas.userSchema import RoleEnum
 
 class Token(BaseModel):
     access_token: str
@@ -10,3 +11,8 @@ class TokenData(BaseModel):
 class UserLogin(BaseModel):
     email:    EmailStr
     password: str
+
+# Authenticated caller as seen by route dependencies
+class Principal(BaseModel):
+    id:   int
+    role: RoleEnum
@@ -1,3 +1,6 @@
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Any
 
@@ -5,9 +8,7 @@ from jose import jwt
 from passlib.context import CryptContext
 from app.common.config.config import settings
 
-# JWT settings
-SECRET_KEY   = settings.secret_key      
-ALGORITHM    = settings.jwt_algorithm   
+# JWT settings (secret key and algorithm are read from settings when used)
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 # Password hashing
@@ -26,8 +27,33 @@ def create_access_token(data: dict[str, Any], expires_delta: timedelta | None =
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, settings.secret_key, algorithm=settings.jwt_algorithm)
 
 # Decode and verify a JWT access token
 def decode_access_token(token: str) -> dict[str, Any]:
-    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    return jwt.decode(token, settings.secret_key, algorithms=[settings.jwt_algorithm])
+
+
+# Decoded tokens, kept until their own expiry so repeated requests skip signature checks
+_decoded_tokens: OrderedDict[str, tuple[dict[str, Any], float]] = OrderedDict()
+_decoded_tokens_lock = threading.Lock()
+
+# Decode a JWT access token, memoizing the verified payload until the token expires
+def decode_access_token_cached(token: str) -> dict[str, Any]:
+    now = time.time()
+    with _decoded_tokens_lock:
+        entry = _decoded_tokens.get(token)
+        if entry is not None:
+            if entry[1] > now:
+                _decoded_tokens.move_to_end(token)
+                return entry[0]
+            del _decoded_tokens[token]
+
+    payload = decode_access_token(token)
+    expires_at = payload.get("exp")
+    if isinstance(expires_at, (int, float)) and settings.token_cache_max_size > 0:
+        with _decoded_tokens_lock:
+            _decoded_tokens[token] = (payload, float(expires_at))
+            while len(_decoded_tokens) > settings.token_cache_max_size:
+                _decoded_tokens.popitem(last=False)
+    return payload
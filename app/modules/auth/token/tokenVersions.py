@@ -0,0 +1,141 @@
+import asyncio
+import threading
+from datetime import timedelta
+
+from loguru import logger
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.common.config.config import FromSettings
+from app.common.db.session import SessionLocal
+from app.common.notifications.bus import TOKEN_VERSIONS, chunk_for_notify, event_bus
+from app.models.userChangeModel import UserChange
+from app.models.userModel import User
+from app.modules.users.changes.changeLog import DELETED, VISIBLE_TXID
+
+# Minimum version for deleted users: none of their tokens is current anymore
+DELETED_VERSION = 2**31 - 1
+
+
+class TokenVersionMap:
+    """
+    Minimum accepted token version per user, used by stateless authorization.
+
+    Tokens carry the user's `token_version` at issuance ("ver" claim). Changing a
+    user's password bumps the column, and any token with an older "ver" is rejected.
+    Only users that were ever revoked are tracked, so the map stays small. Deleted
+    users have no row left to carry their version; their tombstones in the change
+    log (kept at least a token lifetime by compaction) stand in for it. The map is
+    warmed from both at startup, kept in sync across workers through the
+    TOKEN_VERSIONS topic of the event bus, and re-read from the change log
+    periodically to catch deletes whose message a worker missed.
+    """
+    token_lifetime = FromSettings("access_token_expire_minutes", lambda minutes: timedelta(minutes=minutes))
+
+    def __init__(self):
+        self._min_versions: dict[int, int] = {}
+        self._lock = threading.Lock()
+        # Change log entries below this transaction id have been read
+        self._seen_txid = 0
+
+    def is_current(self, user_id: int, version: int) -> bool:
+        return version >= self._min_versions.get(user_id, 0)
+
+    def bump(self, user_id: int, version: int) -> None:
+        """Reject tokens for `user_id` whose version is lower than `version`."""
+        with self._lock:
+            if version > self._min_versions.get(user_id, 0):
+                self._min_versions[user_id] = version
+
+    def load(self, db: Session) -> int:
+        """
+        Load every user with a non-zero token version and every user deleted within a
+        token lifetime; returns how many were loaded.
+        """
+        rows = db.query(User.id, User.token_version).filter(User.token_version > 0).all()
+        for row in rows:
+            self.bump(row.id, row.token_version)
+        seen = self._visible_txid(db)
+        deleted = db.execute(
+            select(UserChange.user_id).where(
+                UserChange.type == DELETED,
+                UserChange.txid < seen,
+                UserChange.changed_at > func.now() - self.token_lifetime,
+            )
+        ).scalars().all()
+        self._bump_deleted(deleted, seen)
+        return len(rows) + len(deleted)
+
+    def refresh(self, db: Session) -> int:
+        """Load the users deleted since the last load or refresh; returns how many there were."""
+        seen = self._visible_txid(db)
+        deleted = db.execute(
+            select(UserChange.user_id).where(
+                UserChange.type == DELETED,
+                UserChange.txid >= self._seen_txid,
+                UserChange.txid < seen,
+            )
+        ).scalars().all()
+        self._bump_deleted(deleted, seen)
+        return len(deleted)
+
+    # Oldest transaction id still running; no change log entry below it can appear anymore
+    @staticmethod
+    def _visible_txid(db: Session) -> int:
+        return db.execute(select(VISIBLE_TXID)).scalar()
+
+    def _bump_deleted(self, user_ids: list[int], seen: int) -> None:
+        for user_id in user_ids:
+            self.bump(user_id, DELETED_VERSION)
+        self._seen_txid = max(self._seen_txid, seen)
+
+    def __len__(self) -> int:
+        return len(self._min_versions)
+
+
+token_versions = TokenVersionMap()
+
+
+# Publish a revocation so every worker's map rejects the user's older tokens
+async def publish_revocation(user_id: int, version: int) -> None:
+    token_versions.bump(user_id, version)
+    await event_bus.publish(TOKEN_VERSIONS, {"user_id": user_id, "version": version})
+
+
+# Publish many revocations at once, e.g. after a bulk delete: {user_id: version}
+async def publish_revocations(versions: dict[int, int]) -> None:
+    for user_id, version in versions.items():
+        token_versions.bump(user_id, version)
+    for chunk in chunk_for_notify([[user_id, version] for user_id, version in versions.items()]):
+        await event_bus.publish(TOKEN_VERSIONS, {"versions": chunk})
+
+
+# Apply a revocation (or a batch of them) published by any worker
+async def apply_revocation(payload: dict) -> None:
+    if "versions" in payload:
+        for user_id, version in payload["versions"]:
+            token_versions.bump(user_id, version)
+    else:
+        token_versions.bump(payload["user_id"], payload["version"])
+
+
+event_bus.subscribe(TOKEN_VERSIONS, apply_revocation)
+
+
+# Load (once) or refresh the map on a session of its own
+def sync_token_versions(initial: bool = False) -> int:
+    db = SessionLocal()
+    try:
+        return token_versions.load(db) if initial else token_versions.refresh(db)
+    finally:
+        db.close()
+
+
+# Refresh the map every `interval` seconds; started by the app's lifespan with stateless auth
+async def refresh_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(sync_token_versions)
+        except Exception:
+            logger.exception("Refreshing token revocations failed")
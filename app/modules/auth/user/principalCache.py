@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.common.config.config import FromSettings
+from app.common.notifications.bus import USER_EVENTS, event_bus, user_events
+from app.modules.auth.schemas.authSchemas import Principal
+
+
+class PrincipalCache:
+    """
+    In-process TTL + LRU cache of authenticated principals (id and role).
+
+    Lets get_current_user skip the database on hot paths. Entries are dropped by
+    usersRepo whenever a user is updated or deleted, so role changes and deletions
+    take effect immediately in this process, and by the user events on the event bus
+    in every other worker. The TTL only bounds staleness when a bus message is lost.
+    """
+    max_size    = FromSettings("principal_cache_max_size")
+    ttl_seconds = FromSettings("principal_cache_ttl_seconds")
+
+    def __init__(self, max_size: int | None = None, ttl_seconds: float | None = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[int, tuple[Principal, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so lookups that raced with a write don't re-cache stale data
+        self._epoch = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+
+    def get(self, user_id: int) -> Principal | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, principal: Principal, epoch: int) -> None:
+        """Cache a principal loaded when the cache was at `epoch`; ignored if a write happened since."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._entries[principal.id] = (principal, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+principal_cache = PrincipalCache()
+
+
+# Drop cached principals for users changed or deleted by any worker
+async def invalidate_on_user_event(payload: dict) -> None:
+    for event in user_events(payload):
+        if event["type"] in ("updated", "deleted"):
+            principal_cache.invalidate(event["user"]["id"])
+
+
+event_bus.subscribe(USER_EVENTS, invalidate_on_user_event)
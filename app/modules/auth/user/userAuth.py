@@ -1,11 +1,18 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.userModel import User
+from app.modules.auth.token.passwordHasher import verify_password_async
 from app.modules.auth.token.token import hash_password, verify_password
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app.common.db.session import get_db
-from app.modules.auth.token.token import decode_access_token
+from app.modules.auth.schemas.authSchemas import Principal
+from app.common.config.config import settings
+from app.modules.auth.token.token import decode_access_token_cached
+from app.modules.auth.token.tokenVersions import token_versions
+from app.modules.auth.user.principalCache import principal_cache
 from app.modules.users.schemas.userSchema import RoleEnum
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
@@ -19,6 +26,14 @@ def authenticate_user(db: Session, email: str, password: str) -> User:
     return user
 
 
+# Async variant of authenticate_user; bcrypt verification runs on the hashing pool
+async def authenticate_user_async(db: AsyncSession, email: str, password: str) -> User:
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
+    if not user or not await verify_password_async(password, user.hashed_password):
+        return None
+    return user
+
+
 # Creates new user account with hashed password
 def register_user(db: Session, user_data: dict) -> User:
     user_data["hashed_password"] = hash_password(user_data.pop("password"))
@@ -29,31 +44,48 @@ def register_user(db: Session, user_data: dict) -> User:
     return user
 
 
-# Validates JWT token and returns current authenticated user
+# Validates JWT token and returns the current authenticated principal (id and role).
+# With STATELESS_AUTH the principal comes straight from the token claims; otherwise
+# it is served from the in-process cache and the DB is only hit on a miss. Misses read
+# the primary, never a replica: a lagging replica could hand back (and get cached for the
+# TTL) a user that was just deleted or changed. The session only connects on a miss.
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
-):
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
     )
     try:
-        payload = decode_access_token(token)
+        payload = decode_access_token_cached(token)
         user_id: int = payload.get("user_id")
         if user_id is None:
             raise credentials_exception
     except Exception:
         raise credentials_exception
-    user = db.query(User).get(user_id)
-    if not user:
+
+    # Stateless mode: role and token version come from the claims, no DB lookup at all
+    if settings.stateless_auth and "role" in payload and "ver" in payload:
+        if not token_versions.is_current(user_id, payload["ver"]):
+            raise credentials_exception
+        return Principal(id=user_id, role=payload["role"])
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    epoch = principal_cache.epoch
+    row = db.query(User.id, User.role).filter(User.id == user_id).first()
+    if not row:
         raise credentials_exception
-    return user
+    principal = Principal(id=row.id, role=row.role)
+    principal_cache.put(principal, epoch)
+    return principal
 
 
 # Dependency that checks if user has required role
 def require_role(*allowed: RoleEnum):
-    def dep(user = Depends(get_current_user)):
+    def dep(user: Principal = Depends(get_current_user)):
         if user.role not in allowed:
             raise HTTPException(status.HTTP_403_FORBIDDEN, "Insufficient permissions")
         return user
@@ -0,0 +1,171 @@
+"""
+Persistent change log behind GET /users/changes.
+
+Every write path records its changes here in its own transaction. Compaction runs
+periodically from the app (CHANGE_LOG_COMPACT_INTERVAL_SECONDS), or on demand:
+
+    python -m app.modules.users.changes.changeLog
+"""
+import asyncio
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import BigInteger, Text, bindparam, cast, delete, exists, func, insert, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from app.common.config.config import settings
+from app.common.db.session import SessionLocal, get_engine
+from app.models.userChangeModel import UserChange, UserChangeCompaction
+
+# Change types, named like the WebSocket events
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+# Log positions are (txid, seq) and writers don't coordinate. Readers only return entries whose txid
+# is below the oldest transaction still running (VISIBLE_TXID): every transaction with a lower id has
+# committed or aborted, so an entry committing later always lands after a reader's position.
+CURRENT_TXID = cast(cast(func.pg_current_xact_id(), Text), BigInteger)
+VISIBLE_TXID = cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
+
+# Transaction-scoped advisory lock letting only one worker compact at a time
+COMPACTION_LOCK = 7_301_002
+_TRY_LOCK = text("SELECT pg_try_advisory_xact_lock(:key)")
+
+# A transaction can get its id before waiting on the row lock of a user another transaction (with a
+# higher id) then changes and commits, e.g. a multi-row UPDATE. Its entry for that user takes the
+# other entry's txid instead, so each user's entries stay in the order they were written.
+_prior = aliased(UserChange)
+_INSERT = insert(UserChange).values(
+    user_id=bindparam("uid"),
+    txid=func.greatest(
+        CURRENT_TXID,
+        select(func.max(_prior.txid)).where(_prior.user_id == bindparam("uid")).scalar_subquery(),
+    ),
+)
+
+
+# Log entries for users (dicts of UserOut columns; deletes only need "id")
+def _entries(change_type: str, users: List[dict]) -> List[dict]:
+    return [
+        {"uid": user["id"], "type": change_type, "data": None if change_type == DELETED else user}
+        for user in users
+    ]
+
+
+# Record changes of one type in the caller's (uncommitted) transaction; `db` is a Session or Connection
+def record_changes(db, change_type: str, users: List[dict]) -> None:
+    if users:
+        db.execute(_INSERT, _entries(change_type, users))
+
+
+# Async variant of record_changes
+async def record_changes_async(db: AsyncSession, change_type: str, users: List[dict]) -> None:
+    if users:
+        await db.execute(_INSERT, _entries(change_type, users))
+
+
+# Up to `limit` changes after log position `after` (txid, seq), oldest first. Entries of transactions
+# that may still be running, and those after them, are held back until they have all finished.
+def get_changes(db: Session, after: Tuple[int, int], limit: int) -> List[dict]:
+    stmt = (
+        select(
+            UserChange.txid, UserChange.seq, UserChange.type, UserChange.user_id,
+            UserChange.data.label("user"), UserChange.changed_at,
+        )
+        .where(tuple_(UserChange.txid, UserChange.seq) > tuple_(*after), UserChange.txid < VISIBLE_TXID)
+        .order_by(UserChange.txid, UserChange.seq)
+        .limit(limit)
+    )
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+# Highest log position (txid, seq) whose tombstone was compacted away ((0, 0) if none was yet)
+def compaction_horizon(db: Session) -> Tuple[int, int]:
+    row = db.execute(
+        select(UserChangeCompaction.horizon_txid, UserChangeCompaction.horizon_seq)
+        .order_by(UserChangeCompaction.horizon_txid.desc(), UserChangeCompaction.horizon_seq.desc())
+        .limit(1)
+    ).first()
+    return tuple(row) if row else (0, 0)
+
+
+# Compact the log in one transaction:
+#   - entries older than `retention` that a newer entry of the same user supersedes are removed;
+#     readers at any cursor still get the newer one, so this is invisible to them
+#   - every entry of users deleted longer ago than `tombstone_retention` is removed, and the
+#     highest removed position is recorded as the horizon; feeds resuming from below it must resync
+# What remains is at most one entry per user, so reading the log from the start is a full sync.
+# Returns the number of entries removed, or None when another worker is already compacting.
+def compact_changes(db: Session, retention: timedelta, tombstone_retention: timedelta) -> Optional[int]:
+    try:
+        if not db.execute(_TRY_LOCK, {"key": COMPACTION_LOCK}).scalar():
+            return None
+        newer = aliased(UserChange)
+        superseded = db.execute(
+            delete(UserChange)
+            .where(
+                UserChange.changed_at < func.now() - retention,
+                exists().where(newer.user_id == UserChange.user_id, newer.seq > UserChange.seq),
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        deleted_users = select(UserChange.user_id).where(
+            UserChange.type == DELETED,
+            UserChange.changed_at < func.now() - tombstone_retention,
+        )
+        horizon = db.execute(
+            select(UserChange.txid, UserChange.seq)
+            .where(UserChange.user_id.in_(deleted_users))
+            .order_by(UserChange.txid.desc(), UserChange.seq.desc())
+            .limit(1)
+        ).first()
+        tombstoned = 0
+        if horizon is not None:
+            tombstoned = db.execute(
+                delete(UserChange)
+                .where(UserChange.user_id.in_(deleted_users))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.execute(insert(UserChangeCompaction).values(horizon_txid=horizon.txid, horizon_seq=horizon.seq, removed=tombstoned))
+        db.commit()
+        return superseded + tombstoned
+    except Exception:
+        db.rollback()
+        raise
+
+
+# Compact with the configured retention windows, on a session of its own
+def run_compaction() -> Optional[int]:
+    get_engine()
+    db = SessionLocal()
+    try:
+        # Tombstones outlive every token of the deleted user: stateless auth reloads revocations from them
+        tombstone_retention = max(
+            timedelta(hours=settings.change_log_tombstone_retention_hours),
+            timedelta(minutes=settings.access_token_expire_minutes),
+        )
+        removed = compact_changes(db, timedelta(hours=settings.change_log_retention_hours), tombstone_retention)
+    finally:
+        db.close()
+    if removed is not None:
+        logger.info("Compacted the user change log: {} entries removed", removed)
+    return removed
+
+
+# Compact every `interval` seconds; started by the app's lifespan
+async def compact_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(run_compaction)
+        except Exception:
+            logger.exception("User change log compaction failed")
+
+
+if __name__ == "__main__":
+    removed = run_compaction()
+    print("Another process is compacting" if removed is None else f"Removed {removed} entries")
@@ -0,0 +1,61 @@
+import csv
+import io
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Dict, List
+
+import orjson
+from loguru import logger
+
+from app.common.config.config import settings
+from app.common.db.session import AsyncSessionLocal, get_async_engine
+from app.modules.users.repositories.usersRepo import USER_OUT_COLUMNS, stream_users_async
+
+# CSV header, in UserOut order
+EXPORT_FIELDS = [column.key for column in USER_OUT_COLUMNS]
+
+
+# One JSON object per line
+def encode_ndjson(rows: List[dict], first: bool) -> bytes:
+    return b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+
+# CSV rows, preceded by the header in the first batch
+def encode_csv(rows: List[dict], first: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, EXPORT_FIELDS)
+    if first:
+        writer.writeheader()
+    writer.writerows({**row, "role": row["role"].value} for row in rows)
+    return buffer.getvalue().encode()
+
+
+# format name -> (encoder, media type, file extension)
+EXPORT_FORMATS: Dict[str, tuple[Callable[[List[dict], bool], bytes], str, str]] = {
+    "ndjson": (encode_ndjson, "application/x-ndjson", "ndjson"),
+    "csv":    (encode_csv, "text/csv; charset=utf-8", "csv"),
+}
+
+
+async def export_users(filters: dict, format: str) -> AsyncIterator[bytes]:
+    """
+    Encode every user matching `filters` in `format`, one chunk per cursor batch.
+
+    The session is owned by the stream rather than a request dependency (those are
+    closed before a streaming body is sent). Closing the iterator, e.g. when the
+    client goes away, closes the cursor and returns the connection to the pool.
+    """
+    encode = EXPORT_FORMATS[format][0]
+    exported, finished = 0, False
+    get_async_engine()
+    try:
+        async with AsyncSessionLocal() as db:
+            batches = stream_users_async(db, filters, settings.export_batch_size)
+            async with aclosing(batches):
+                async for rows in batches:
+                    yield encode(rows, exported == 0)
+                    exported += len(rows)
+            if exported == 0 and format == "csv":
+                yield encode([], True)
+        finished = True
+    finally:
+        logger.info("export {} after {} users ({})", "finished" if finished else "aborted", exported, format)
@@ -1,18 +1,62 @@
+import asyncio
 from sqlite3 import IntegrityError
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
 from fastapi import HTTPException,status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app.common.config.config import settings
 from app.common.errors.errors import DuplicateEntity, EntityNotFound
+from app.common.pagination.count import count_cache, planner_estimate, table_estimate
 from app.models.userModel import User
-from app.modules.auth.token.token import hash_password
-from app.modules.users.schemas.userSchema import RoleEnum, UserCreate, UserUpdate
-from sqlalchemy import func, or_, and_
+from app.modules.auth.token.passwordHasher import hash_password_async, password_hasher
+from app.modules.auth.token.tokenVersions import publish_revocation, publish_revocations
+from app.modules.auth.user.principalCache import principal_cache
+from app.modules.users.changes.changeLog import CREATED, DELETED, UPDATED, record_changes_async
+from app.modules.users.schemas.userSchema import RoleEnum, UserBulkUpdateItem, UserCreate, UserUpdate
+from sqlalchemy import ARRAY, Integer, any_, bindparam, column, delete, func, or_, and_, select, true, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
-# Retrieve all users from the database
-def get_users(db: Session) -> list[User]:
+# Columns exposed through UserOut; read paths select only these, as plain dict rows,
+# so no ORM objects (or password hashes) are loaded just to be serialized
+USER_OUT_COLUMNS = (
+    User.id,
+    User.first_name,
+    User.last_name,
+    User.email,
+    User.gender,
+    User.ip_address,
+    User.role,
+)
+
+# Row version columns, selected next to USER_OUT_COLUMNS to build HTTP validators
+VERSION_COLUMNS = (User.version, User.updated_at)
+
+# Columns returned by writes: the UserOut columns plus the row version that orders user events
+WRITTEN_COLUMNS = (*USER_OUT_COLUMNS, User.version)
+
+
+# The UserOut columns of a loaded User as a dict
+def _user_out(db_user: User) -> dict:
+    return {column.key: getattr(db_user, column.key) for column in USER_OUT_COLUMNS}
+
+
+# Run a UserOut projection and return its rows as dicts
+def _fetch_rows(db: Session, stmt) -> list[dict]:
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+# Retrieve one page of users (with their version columns), ordered by ID, using LIMIT/OFFSET in SQL
+def get_users(db: Session, limit: int, offset: int = 0) -> list[dict]:
     try:
-        return db.query(User).all()
+        return _fetch_rows(
+            db,
+            select(*USER_OUT_COLUMNS, *VERSION_COLUMNS)
+            .order_by(User.id)
+            .offset(offset)
+            .limit(limit),
+        )
     except SQLAlchemyError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -20,83 +64,423 @@ def get_users(db: Session) -> list[User]:
         )
 
 
-# Retrieve a single user by their ID, or raise 404 if not found
-def get_user(db: Session, user_id: int) -> User:
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+# Retrieve up to `limit` users with an ID greater than `after_id` (keyset pagination)
+def get_users_after(db: Session, after_id: Optional[int], limit: int) -> list[dict]:
+    try:
+        stmt = select(*USER_OUT_COLUMNS)
+        if after_id is not None:
+            stmt = stmt.where(User.id > after_id)
+        return _fetch_rows(db, stmt.order_by(User.id).limit(limit))
+    except SQLAlchemyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error fetching users"
+        )
+
+
+# Retrieve a single user's UserOut and version columns as a dict, or raise 404 if not found
+def get_user_row(db: Session, user_id: int) -> dict:
+    row = db.execute(select(*USER_OUT_COLUMNS, *VERSION_COLUMNS).where(User.id == user_id)).mappings().first()
+    if not row:
         raise EntityNotFound('User')
-    return user
+    return dict(row)
 
 
-# Create a new user, hashing their password and handling duplicates
-def create_user(db: Session, user_in: UserCreate, creator_role: RoleEnum) -> User:
-    data = user_in.model_dump()
+# Retrieve only a user's (version, updated_at), or raise 404 if not found
+def get_user_version(db: Session, user_id: int) -> tuple[int, datetime]:
+    row = db.execute(select(*VERSION_COLUMNS).where(User.id == user_id)).first()
+    if not row:
+        raise EntityNotFound('User')
+    return row.version, row.updated_at
+
+
+# Build the column values for a new user, enforcing who may assign roles
+def _new_user_data(user_in: UserCreate, creator_role: RoleEnum, hashed_password: str) -> dict:
+    data = user_in.model_dump(exclude={"password"})
     # Only superadmin may assign roles other than 'user'
     if creator_role is not RoleEnum.superadmin:
         data["role"] = RoleEnum.user
-    data["hashed_password"] = hash_password(data.pop("password"))
-    db_user = User(**data)
+    data["hashed_password"] = hashed_password
+    return data
+
+
+# Create a new user, hashing their password on the hashing pool and handling duplicates
+async def create_user_async(db: AsyncSession, user_in: UserCreate, creator_role: RoleEnum) -> User:
+    hashed_password = await hash_password_async(user_in.password)
+    db_user = User(**_new_user_data(user_in, creator_role, hashed_password))
     db.add(db_user)
     try:
-        db.commit()
-        db.refresh(db_user)
+        await db.flush()
+        await record_changes_async(db, CREATED, [_user_out(db_user)])
+        await db.commit()
+        await db.refresh(db_user)
         return db_user
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise DuplicateEntity("User", "email")
     except SQLAlchemyError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(500, "Error creating user")
 
 
-# Update an existing user with validation and authorization checks
-def update_user(db: Session, target_id: int, updater_id: int, updater_role: RoleEnum, user_in: UserUpdate) -> User:
-    db_user = get_user(db, target_id)
-    # Authorization:
+# 403 detail per updater role when the target is out of reach
+UPDATE_FORBIDDEN = {
+    RoleEnum.user: "Users can only update their own profile",
+    RoleEnum.admin: "Admins can only update users with role 'user'",
+}
+
+
+# Raise 403 unless the updater is allowed to modify the target user
+def _check_update_allowed(target_role: RoleEnum, target_id: int, updater_id: int, updater_role: RoleEnum) -> None:
     if updater_role == RoleEnum.user:
         # users can only update themselves
         if updater_id != target_id:
-            raise HTTPException(status.HTTP_403_FORBIDDEN, "Users can only update their own profile")
+            raise HTTPException(status.HTTP_403_FORBIDDEN, UPDATE_FORBIDDEN[updater_role])
     elif updater_role == RoleEnum.admin:
         # admins can update themselves and users only
-        if updater_id != target_id and db_user.role != RoleEnum.user:
-            raise HTTPException(status.HTTP_403_FORBIDDEN, "Admins can only update users with role 'user'")
+        if updater_id != target_id and target_role != RoleEnum.user:
+            raise HTTPException(status.HTTP_403_FORBIDDEN, UPDATE_FORBIDDEN[updater_role])
+
+
+# The rule of _check_update_allowed as a WHERE clause on the target row
+def _update_allowed_clause(updater_id: int, updater_role: RoleEnum):
+    if updater_role == RoleEnum.user:
+        return User.id == updater_id
+    if updater_role == RoleEnum.admin:
+        return or_(User.id == updater_id, User.role == RoleEnum.user)
+    return true()
+
 
-    data = user_in.model_dump()
-    if(user_in.password):
-        data["hashed_password"] = hash_password(data.pop("password"))
+# Column values for a single-user UPDATE: the provided (non-null) fields, an already hashed
+# new password (which also bumps the token version, revoking earlier tokens) and the bumped row version
+def _update_values(user_in: UserUpdate, hashed_password: Optional[str]) -> dict:
+    values = {field: val for field, val in user_in.model_dump(exclude={"password"}).items() if val is not None}
+    if hashed_password:
+        values["hashed_password"] = hashed_password
+        values["token_version"] = User.__table__.c.token_version + 1
+    values["version"] = User.__table__.c.version + 1
+    return values
 
-    for field, val in data.items():
-        if val is not None:
-            setattr(db_user, field, val)
+
+# UPDATE ... WHERE id AND <authorization> RETURNING in one round trip. The `target` CTE looks the
+# row up in the same snapshot, so the single result row tells the outcomes apart: no row when the
+# user doesn't exist, NULL UserOut columns when the authorization clause filtered it out.
+def _update_statement(target_id: int, updater_id: int, updater_role: RoleEnum, values: dict):
+    users = User.__table__
+    target = select(users.c.id.label("target_id")).where(users.c.id == target_id).cte("target")
+    updated = (
+        update(users)
+        .where(users.c.id == target_id, _update_allowed_clause(updater_id, updater_role))
+        .values(values)
+        .returning(*WRITTEN_COLUMNS, User.token_version)
+        .cte("updated")
+    )
+    return select(target.c.target_id, updated).select_from(target.outerjoin(updated, true()))
+
+
+# Turn the result row of _update_statement into the updated UserOut columns and versions, raising 404 or 403
+def _updated_user(row, updater_role: RoleEnum) -> dict:
+    if row is None:
+        raise EntityNotFound('User')
+    user = dict(row)
+    del user["target_id"]
+    if user["id"] is None:
+        raise HTTPException(status.HTTP_403_FORBIDDEN, UPDATE_FORBIDDEN[updater_role])
+    return user
+
+
+# Update an existing user with validation and authorization checks, in a single statement.
+# Returns the updated UserOut columns and row version as a dict.
+async def update_user_async(db: AsyncSession, target_id: int, updater_id: int, updater_role: RoleEnum, user_in: UserUpdate) -> dict:
+    hashed_password = await hash_password_async(user_in.password) if user_in.password else None
+    values = _update_values(user_in, hashed_password)
     try:
-        db.commit()
-        db.refresh(db_user)
-        return db_user
+        row = (await db.execute(_update_statement(target_id, updater_id, updater_role, values))).mappings().first()
+        user = _updated_user(row, updater_role)
+        token_version = user.pop("token_version")
+        await record_changes_async(db, UPDATED, [user])
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise DuplicateEntity("User", "email")
     except SQLAlchemyError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(500, "Error updating user")
+    principal_cache.invalidate(target_id)
+    if hashed_password:
+        await publish_revocation(target_id, token_version)
+    return user
+
 
+# DELETE ... RETURNING the UserOut columns, row version and token version of the rows matching `where`
+def _delete_statement(where):
+    return (
+        delete(User)
+        .where(where)
+        .returning(*WRITTEN_COLUMNS, User.token_version)
+        .execution_options(synchronize_session=False)
+    )
 
-# Delete a user by ID (only superadmin allowed)
-def delete_user(db: Session, target_id: int, deleter_role: RoleEnum) -> None:
+
+# Delete a user by ID (only superadmin allowed) in a single statement; returns the deleted UserOut columns and row version
+async def delete_user_async(db: AsyncSession, target_id: int, deleter_role: RoleEnum) -> dict:
     if deleter_role is not RoleEnum.superadmin:
         raise HTTPException(status.HTTP_403_FORBIDDEN, "Only superadmin can delete users")
     try:
-        db_user = get_user(db, target_id)
-        db.delete(db_user)
-        db.commit()
-    except EntityNotFound:
-        raise
+        row = (await db.execute(_delete_statement(User.id == target_id))).mappings().first()
+        if row is None:
+            raise EntityNotFound('User')
+        await record_changes_async(db, DELETED, [row])
+        await db.commit()
     except SQLAlchemyError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error deleting user"
         )
+    user = dict(row)
+    principal_cache.invalidate(target_id)
+    await publish_revocation(target_id, user.pop("token_version") + 1)
+    return user
+
+# Result entry for one item of a bulk request
+def _bulk_result(index: int, status_code: int, user_id: Optional[int] = None, user: Optional[dict] = None, detail: Optional[str] = None) -> dict:
+    return {"index": index, "id": user_id, "status": status_code, "detail": detail, "user": user}
+
+
+# Hash a batch of passwords one pool job each, with at most half the pool's workers busy on this
+# batch at a time, so a bulk request queues behind other requests' jobs instead of taking the pool
+async def _hash_passwords(passwords: list[str]) -> list[str]:
+    slots = asyncio.Semaphore(max(1, password_hasher.workers // 2))
+
+    async def hash_one(raw: str) -> str:
+        async with slots:
+            return await password_hasher.hash(raw)
+
+    jobs = [asyncio.ensure_future(hash_one(raw)) for raw in passwords]
+    try:
+        return list(await asyncio.gather(*jobs))
+    except BaseException:
+        # The pool is full (503) or the request was cancelled: don't hash the rest
+        for job in jobs:
+            job.cancel()
+        raise
+
+
+# Create many users with one multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING, in one transaction.
+# Emails that already exist (or repeat within the batch) are reported as 409 for their item.
+async def bulk_create_users_async(db: AsyncSession, users_in: List[UserCreate], creator_role: RoleEnum) -> List[dict]:
+    results: List[Optional[dict]] = [None] * len(users_in)
+    accepted: List[int] = []
+    seen_emails = set()
+    for index, user_in in enumerate(users_in):
+        if user_in.email in seen_emails:
+            results[index] = _bulk_result(index, status.HTTP_409_CONFLICT, detail="Email appears more than once in the batch")
+        else:
+            seen_emails.add(user_in.email)
+            accepted.append(index)
+
+    inserted: dict = {}
+    if accepted:
+        hashes = await _hash_passwords([users_in[i].password for i in accepted])
+        rows = [_new_user_data(users_in[i], creator_role, hashed) for i, hashed in zip(accepted, hashes)]
+        stmt = (
+            pg_insert(User)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(*WRITTEN_COLUMNS)
+        )
+        try:
+            inserted = {row["email"]: dict(row) for row in (await db.execute(stmt)).mappings()}
+            await record_changes_async(db, CREATED, list(inserted.values()))
+            await db.commit()
+        except SQLAlchemyError:
+            await db.rollback()
+            raise HTTPException(500, "Error creating users")
+
+    for index in accepted:
+        row = inserted.get(users_in[index].email)
+        if row:
+            results[index] = _bulk_result(index, status.HTTP_201_CREATED, row["id"], row)
+        else:
+            results[index] = _bulk_result(index, status.HTTP_409_CONFLICT, detail="User with the same email already exists")
+    return results
+
+
+# UPDATE users SET <fields> FROM (VALUES (id, <field values>), ...) WHERE id AND <authorization> RETURNING
+# the UserOut columns and versions: one statement for every item changing the same fields, bumping the token
+# version too when they change the password. Rows deleted (or put out of reach) since they were checked are
+# simply not returned.
+def _bulk_update_statement(fields: tuple, rows: List[tuple], updater_id: int, updater_role: RoleEnum):
+    users = User.__table__
+    data = values(
+        column("id", Integer), *(column(field, users.c[field].type) for field in fields), name="data",
+    ).data(rows)
+    changes = {field: data.c[field] for field in fields}
+    if "hashed_password" in fields:
+        changes["token_version"] = users.c.token_version + 1
+    return (
+        update(users)
+        .where(users.c.id == data.c.id, _update_allowed_clause(updater_id, updater_role))
+        .values({**changes, "version": users.c.version + 1})
+        .returning(*WRITTEN_COLUMNS, User.token_version)
+    )
+
+
+# Apply many partial updates in one transaction. Authorization is checked for all targets
+# with a single SELECT, and rows are written with one UPDATE ... RETURNING per distinct set of fields.
+async def bulk_update_users_async(db: AsyncSession, items: List[UserBulkUpdateItem], updater_id: int, updater_role: RoleEnum) -> List[dict]:
+    target_ids = {item.id for item in items}
+    roles = dict((await db.execute(select(User.id, User.role).where(User.id.in_(target_ids)))).all())
+    new_emails = {item.email for item in items if item.email}
+    email_owners = dict((await db.execute(select(User.email, User.id).where(User.email.in_(new_emails)))).all()) if new_emails else {}
+
+    results: List[Optional[dict]] = [None] * len(items)
+    accepted: List[int] = []
+    seen_ids = set()
+    for index, item in enumerate(items):
+        if item.id in seen_ids:
+            results[index] = _bulk_result(index, status.HTTP_400_BAD_REQUEST, item.id, detail="User appears more than once in the batch")
+            continue
+        seen_ids.add(item.id)
+        if item.id not in roles:
+            results[index] = _bulk_result(index, status.HTTP_404_NOT_FOUND, item.id, detail="User not found")
+            continue
+        try:
+            _check_update_allowed(roles[item.id], item.id, updater_id, updater_role)
+        except HTTPException as e:
+            results[index] = _bulk_result(index, e.status_code, item.id, detail=e.detail)
+            continue
+        if item.email and email_owners.setdefault(item.email, item.id) != item.id:
+            results[index] = _bulk_result(index, status.HTTP_409_CONFLICT, item.id, detail="User with the same email already exists")
+            continue
+        accepted.append(index)
+
+    with_password = [i for i in accepted if items[i].password]
+    hashes = dict(zip(with_password, await _hash_passwords([items[i].password for i in with_password])))
+
+    # Group the items by the fields they change; each group is one UPDATE (items changing nothing
+    # still get their version bumped, like a single update with an empty body)
+    groups: dict[tuple, list[tuple]] = {}
+    for index in accepted:
+        changes = {
+            field: val
+            for field, val in items[index].model_dump(exclude={"id", "password"}).items()
+            if val is not None
+        }
+        if index in hashes:
+            changes["hashed_password"] = hashes[index]
+        fields = tuple(sorted(changes))
+        groups.setdefault(fields, []).append((items[index].id, *(changes[field] for field in fields)))
+
+    try:
+        rows = {}
+        revoked_versions = {}
+        for fields, group in groups.items():
+            stmt = _bulk_update_statement(fields, group, updater_id, updater_role)
+            for row in (await db.execute(stmt)).mappings():
+                user = dict(row)
+                token_version = user.pop("token_version")
+                if "hashed_password" in fields:
+                    revoked_versions[user["id"]] = token_version
+                rows[user["id"]] = user
+        await record_changes_async(db, UPDATED, list(rows.values()))
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise DuplicateEntity("User", "email")
+    except SQLAlchemyError:
+        await db.rollback()
+        raise HTTPException(500, "Error updating users")
+    if revoked_versions:
+        await publish_revocations(revoked_versions)
+
+    for index in accepted:
+        user_id = items[index].id
+        if user_id in rows:
+            principal_cache.invalidate(user_id)
+            results[index] = _bulk_result(index, status.HTTP_200_OK, user_id, rows[user_id])
+        else:
+            # Deleted by a concurrent request after the authorization SELECT
+            results[index] = _bulk_result(index, status.HTTP_404_NOT_FOUND, user_id, detail="User not found")
+    return results
+
+
+# Delete many users with one DELETE ... WHERE id = ANY(...) RETURNING (only superadmin allowed)
+async def bulk_delete_users_async(db: AsyncSession, ids: List[int], deleter_role: RoleEnum) -> List[dict]:
+    if deleter_role is not RoleEnum.superadmin:
+        raise HTTPException(status.HTTP_403_FORBIDDEN, "Only superadmin can delete users")
+    stmt = _delete_statement(User.id == any_(bindparam("ids", list(set(ids)), type_=ARRAY(Integer))))
+    try:
+        deleted = {row["id"]: dict(row) for row in (await db.execute(stmt)).mappings()}
+        await record_changes_async(db, DELETED, list(deleted.values()))
+        await db.commit()
+    except SQLAlchemyError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error deleting users"
+        )
+
+    revoked_versions = {}
+    for user_id, row in deleted.items():
+        principal_cache.invalidate(user_id)
+        revoked_versions[user_id] = row.pop("token_version") + 1
+    await publish_revocations(revoked_versions)
+
+    results = []
+    reported = set()
+    for index, user_id in enumerate(ids):
+        if user_id in reported:
+            results.append(_bulk_result(index, status.HTTP_400_BAD_REQUEST, user_id, detail="User appears more than once in the batch"))
+        elif user_id in deleted:
+            results.append(_bulk_result(index, status.HTTP_200_OK, user_id, deleted[user_id]))
+        else:
+            results.append(_bulk_result(index, status.HTTP_404_NOT_FOUND, user_id, detail="User not found"))
+        reported.add(user_id)
+    return results
     
 
-# Search users with optional filters for names, email, gender, and IP
+# Build the WHERE clauses shared by the search queries
+def _search_filters(
+    first_name: Optional[str] = None,
+    last_name:  Optional[str] = None,
+    email:      Optional[str] = None,
+    gender:     Optional[str] = None,
+    ip_address: Optional[str] = None,
+) -> list:
+    # Substring filters are served by the pg_trgm GIN indexes declared on the User model
+    filters = []
+    if first_name:
+        filters.append(User.first_name.ilike(f"%{first_name}%"))
+    if last_name:
+        filters.append(User.last_name.ilike(f"%{last_name}%"))
+    if email:
+        filters.append(User.email.ilike(f"%{email}%"))
+    if gender:
+        filters.append(func.lower(User.gender) == gender.lower())
+    if ip_address:
+        filters.append(User.ip_address == ip_address)
+    return filters
+
+
+# Stream every user matching the search filters, ordered by ID, in lists of up to `batch_size` rows.
+# Rows come from a server-side cursor, so memory is bounded by the batch size and not the table size;
+# the cursor is closed when the iterator is closed, including mid-stream.
+async def stream_users_async(db: AsyncSession, filters: dict, batch_size: int) -> AsyncIterator[List[dict]]:
+    stmt = select(*USER_OUT_COLUMNS)
+    clauses = _search_filters(**filters)
+    if clauses:
+        stmt = stmt.where(and_(*clauses))
+    result = await db.stream(stmt.order_by(User.id).execution_options(yield_per=batch_size))
+    try:
+        async for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+    finally:
+        await result.close()
+
+
+# Search users with optional filters for names, email, gender, and IP; one page of rows ordered by ID
 def search_users(
     db: Session,
     first_name: Optional[str] = None,
@@ -104,27 +488,73 @@ def search_users(
     email:      Optional[str] = None,
     gender:     Optional[str] = None,
     ip_address: Optional[str] = None,
-) -> List[User]:
+    limit:      Optional[int] = None,
+    offset:     int = 0,
+) -> List[dict]:
     try:
-        filters = []
-        if first_name:
-            filters.append(User.first_name.ilike(f"%{first_name}%"))
-        if last_name:
-            filters.append(User.last_name.ilike(f"%{last_name}%"))
-        if email:
-            filters.append(User.email.ilike(f"%{email}%"))
-        if gender:
-            filters.append(func.lower(User.gender) == gender.lower())
-        if ip_address:
-            filters.append(User.ip_address == ip_address)
-
-        query = db.query(User)
+        filters = _search_filters(first_name, last_name, email, gender, ip_address)
+        stmt = select(*USER_OUT_COLUMNS)
         if filters:
-            query = query.filter(and_(*filters))
+            stmt = stmt.where(and_(*filters))
+
+        stmt = stmt.order_by(User.id).offset(offset)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return _fetch_rows(db, stmt)
+    except SQLAlchemyError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error searching users"
+        )
+
 
-        return query.all()
+# Count users matching the same filters as search_users
+def count_search_users(
+    db: Session,
+    first_name: Optional[str] = None,
+    last_name:  Optional[str] = None,
+    email:      Optional[str] = None,
+    gender:     Optional[str] = None,
+    ip_address: Optional[str] = None,
+) -> int:
+    try:
+        filters = _search_filters(first_name, last_name, email, gender, ip_address)
+        query = db.query(func.count(User.id))
+        if filters:
+            query = query.filter(and_(*filters))
+        return query.scalar()
     except SQLAlchemyError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error searching users"
-        )
\ No newline at end of file
+        )
+
+
+# Total number of users matching `filters` (all users when none are set) under settings.count_strategy:
+# an exact count, a cached exact count, the planner's estimate, or None for the "none" strategy
+def page_total(db: Session, filters: dict) -> Optional[int]:
+    strategy = settings.count_strategy
+    if strategy == "none":
+        return None
+    active = {field: value for field, value in filters.items() if value}
+    try:
+        if strategy == "estimate":
+            if active:
+                return planner_estimate(db, select(User.id).where(and_(*_search_filters(**active))))
+            estimate = table_estimate(db, User.__table__)
+            if estimate is not None:
+                return estimate
+        elif strategy == "cached":
+            key = tuple(sorted(active.items()))
+            total = count_cache.get(key)
+            if total is None:
+                epoch = count_cache.epoch
+                total = count_search_users(db, **active)
+                count_cache.put(key, total, epoch)
+            return total
+    except SQLAlchemyError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error counting users"
+        )
+    return count_search_users(db, **active)
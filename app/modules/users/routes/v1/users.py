@@ -1,38 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+import json
+from typing import Literal
+from fastapi import APIRouter, Depends, Query, Request, WebSocket, WebSocketDisconnect
 from loguru import logger
 from sqlalchemy.orm import Session
-from fastapi_pagination import Page, Params, paginate
-from app.common.db.session import get_db
-from app.models.userModel import User
+from fastapi.responses import ORJSONResponse
+from fastapi_pagination import Params
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.common.caching.etag import etag_matches, list_etag, not_modified, row_etag, validator_headers
+from app.common.config.config import settings
+from app.common.db.replicas import get_read_db
+from app.common.db.session import get_async_db
+from app.common.errors.errors import BatchTooLarge, CursorExpired
+from app.common.pagination.cursor import decode_cursor, decode_cursor_values, encode_cursor, encode_cursor_values
+from app.common.pagination.page import page_content
+from app.common.ratelimit.limiter import rate_limit
+from app.common.streaming.response import ClosingStreamingResponse, accepts_gzip, gzip_stream
+from app.modules.auth.schemas.authSchemas import Principal
 from app.modules.auth.user.userAuth import get_current_user, require_role
-from app.modules.users.schemas.userSchema import RoleEnum, UserOut, UserCreate, UserUpdate
+from app.modules.users.schemas.userSchema import (
+    BulkResult, RoleEnum, UserBulkCreate, UserBulkDelete, UserBulkUpdate, UserChangePage, UserOut, UserCreate, UserCursorPage, UserPage, UserUpdate,
+)
 from app.modules.users.repositories import usersRepo as repositories
+from app.modules.users.export import userExport as user_export
+from app.modules.users.changes import changeLog as change_log
+from app.common.notifications.bus import user_event
 from app.common.notifications.notification import manager
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from app.modules.users.search.trigramIndex import search_index
 
 router = APIRouter()
-limiter = Limiter(key_func=get_remote_address)
 
-# List users with pagination; accessible by users, admins, and superadmins
-@router.get("/list", response_model=Page[UserOut], dependencies=[Depends(require_role(RoleEnum.user, RoleEnum.admin, RoleEnum.superadmin))])
-@limiter.limit("100/minute")
+# Read routes return rows selected straight from the DB (already shaped like UserOut)
+# as ORJSONResponse, which skips per-row pydantic validation; response_model only documents them.
+
+# Split off the extra row fetched to learn whether another page exists, and keep an
+# estimated total consistent with the rows actually seen
+def _page_rows(rows: list, total: int | None, limit: int, offset: int) -> tuple[list, int | None, bool]:
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    if total is not None and rows:
+        total = max(total, offset + len(rows) + has_next)
+    return rows, total, has_next
+
+
+# List users with pagination; accessible by users, admins, and superadmins.
+# `total` follows COUNT_STRATEGY (see app/common/pagination/count.py).
+@router.get("/list", response_model=UserPage, dependencies=[Depends(require_role(RoleEnum.user, RoleEnum.admin, RoleEnum.superadmin)), Depends(rate_limit("100/minute"))])
 def list_users(
-    request: Request, 
+    request: Request,
     params: Params = Depends(),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     # Calculate offset and limit based on page and size
-    logger.info(f"list_users called by role(s) {params} → page={params.page}, size={params.size}")
-    users = repositories.get_users(db)
-    return paginate(users, params)
+    logger.info("list_users called → page={}, size={}", params.page, params.size)
+    raw_params = params.to_raw_params()
+    users = repositories.get_users(db, limit=raw_params.limit + 1, offset=raw_params.offset)
+    users, total, has_next = _page_rows(users, repositories.page_total(db, {}), raw_params.limit, raw_params.offset)
+    # The page's ETag changes whenever one of its rows, its membership or the total changes
+    versions = [(user["id"], user.pop("version")) for user in users]
+    last_modified = max((user.pop("updated_at") for user in users), default=None)
+    etag = list_etag(versions, total, has_next, raw_params.limit, raw_params.offset)
+    if etag_matches(request, etag):
+        return not_modified(etag, last_modified)
+    return ORJSONResponse(page_content(users, total, params, has_next), headers=validator_headers(etag, last_modified))
+
+
+# List users with keyset pagination on the primary key; pass back `next_cursor` to get the next page
+@router.get("/list/cursor", response_model=UserCursorPage, dependencies=[Depends(require_role(RoleEnum.user, RoleEnum.admin, RoleEnum.superadmin)), Depends(rate_limit("100/minute"))])
+def list_users_cursor(
+    cursor: str | None = None,
+    size:   int = Query(50, ge=1, le=100),
+    db:     Session = Depends(get_read_db),
+):
+    logger.info("list_users_cursor called → cursor={}, size={}", cursor, size)
+    after_id = decode_cursor(cursor) if cursor else None
+    # Fetch one extra row to know whether another page exists
+    users = repositories.get_users_after(db, after_id, size + 1)
+    has_more = len(users) > size
+    users = users[:size]
+    return ORJSONResponse({
+        "items": users,
+        "size": size,
+        "next_cursor": encode_cursor(users[-1]["id"]) if has_more else None,
+    })
 
 
 # Search users with optional filters and pagination; restricted to admin/superadmin
-@router.get("/search", response_model=Page[UserOut],dependencies=[Depends(require_role(RoleEnum.admin, RoleEnum.superadmin))])
-@limiter.limit("50/minute")
+@router.get("/search", response_model=UserPage,dependencies=[Depends(require_role(RoleEnum.admin, RoleEnum.superadmin)), Depends(rate_limit("50/minute"))])
 def search_users(
-    request: Request,
     *,
     params:     Params = Depends(),          
     first_name: str | None = None,
@@ -40,48 +94,179 @@ def search_users(
     email:      str | None = None,
     gender:     str | None = None,
     ip_address: str | None = None,
-    db:         Session = Depends(get_db),
+    db:         Session = Depends(get_read_db),
 ):
     """Search users by any combination of fields."""
-    logger.info(f"search_users called by role(s) {params} → page={params.page}, size={params.size}")
-    users = repositories.search_users(
-        db,
+    logger.info("search_users called → page={}, size={}", params.page, params.size)
+    filters = dict(
         first_name=first_name,
         last_name=last_name,
         email=email,
         gender=gender,
         ip_address=ip_address,
     )
-    return paginate(users, params)
+    raw_params = params.to_raw_params()
+    # The in-memory index answers when it is built and the query has a 3+ character term
+    indexed = search_index.search(filters, limit=raw_params.limit, offset=raw_params.offset)
+    if indexed is not None:
+        users, total = indexed
+        has_next = raw_params.offset + len(users) < total
+    else:
+        users = repositories.search_users(db, **filters, limit=raw_params.limit + 1, offset=raw_params.offset)
+        users, total, has_next = _page_rows(users, repositories.page_total(db, filters), raw_params.limit, raw_params.offset)
+    return ORJSONResponse(page_content(users, total, params, has_next))
+
+
+# Size and build time of the in-memory search index; superadmin only
+@router.get("/search/index", dependencies=[Depends(require_role(RoleEnum.superadmin))])
+def search_index_stats():
+    return search_index.stats()
+
+
+# Stream every user (optionally filtered like /search) as NDJSON or CSV; admin/superadmin only.
+# Gzip is applied on the fly when the client sends Accept-Encoding: gzip.
+@router.get("/export", dependencies=[Depends(require_role(RoleEnum.admin, RoleEnum.superadmin)), Depends(rate_limit("5/minute"))])
+def export_users(
+    *,
+    request:    Request,
+    format:     Literal["ndjson", "csv"] = "ndjson",
+    first_name: str | None = None,
+    last_name:  str | None = None,
+    email:      str | None = None,
+    gender:     str | None = None,
+    ip_address: str | None = None,
+):
+    logger.info("export_users called → format={}", format)
+    filters = dict(
+        first_name=first_name,
+        last_name=last_name,
+        email=email,
+        gender=gender,
+        ip_address=ip_address,
+    )
+    _, media_type, extension = user_export.EXPORT_FORMATS[format]
+    headers = {"Content-Disposition": f'attachment; filename="users.{extension}"', "Vary": "Accept-Encoding"}
+    body = user_export.export_users(filters, format)
+    if accepts_gzip(request):
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return ClosingStreamingResponse(body, media_type=media_type, headers=headers)
+
+
+# Changes to users after the `since` cursor, oldest first, in pages of up to `limit`; admin/superadmin only.
+# Without a cursor the feed starts from the beginning of the (compacted) log, which is a full sync;
+# keep `next_cursor` and pass it back as `since` to get only what changed since.
+@router.get("/changes", response_model=UserChangePage, dependencies=[Depends(require_role(RoleEnum.admin, RoleEnum.superadmin)), Depends(rate_limit("100/minute"))])
+def list_changes(
+    since: str | None = None,
+    limit: int = Query(500, ge=1, le=1000),
+    db:    Session = Depends(get_read_db),
+):
+    logger.info("list_changes called → since={}, limit={}", since, limit)
+    # Cursors carry the log position (txid, seq) and the compaction horizon the client has already been served under
+    values = decode_cursor_values(since, 4) if since else (0, 0, *change_log.compaction_horizon(db))
+    after, seen_horizon = values[:2], values[2:]
+    changes = change_log.get_changes(db, after, limit + 1)
+    # A compaction since then may have removed the delete of a user the client has seen. Checked
+    # after reading the page, so a compaction committing in between can only make this stricter.
+    horizon = change_log.compaction_horizon(db)
+    if horizon > seen_horizon and after < horizon:
+        raise CursorExpired()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    last = after
+    for change in changes:
+        last = (change.pop("txid"), change.pop("seq"))
+    return ORJSONResponse({
+        "changes": changes,
+        "next_cursor": encode_cursor_values(*last, *horizon),
+        "has_more": has_more,
+    })
 
 
 # Create a new admin user; only superadmin can perform this action
 @router.post("/create-admin", response_model=UserOut, dependencies=[Depends(require_role(RoleEnum.superadmin))])
 async def create_user_admin(
     user_data: UserCreate,
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
-    logger.info(f"create_user_admin called with data: {user_data}")
-    user= repositories.create_user(db, user_data, creator_role=current_user.role)
-    await manager.broadcast_event({
-        "type": "created",
-        "user": UserOut.from_orm(user).dict()
-    })
+    logger.info("create_user_admin called by user: {}", current_user.id)
+    user= await repositories.create_user_async(db, user_data, creator_role=current_user.role)
+    await manager.broadcast_event(user_event("created", {**UserOut.from_orm(user).dict(), "version": user.version}))
     return user
 
 
+# Check the item cap shared by the bulk endpoints
+def _check_batch_size(count: int) -> None:
+    if count > settings.bulk_max_items:
+        raise BatchTooLarge(settings.bulk_max_items)
+
+
+# Summarize per-item results and broadcast the successful ones as one batched event
+async def _finish_bulk(results: list[dict], event_type: str) -> dict:
+    events = [user_event(event_type, r["user"]) for r in results if r["status"] < 300]
+    if events:
+        await manager.broadcast_events(events)
+    return {"results": results, "succeeded": len(events), "failed": len(results) - len(events)}
+
+
+# Create many users in one transaction; admins create users, superadmins may assign roles
+@router.post("/bulk", response_model=BulkResult, dependencies=[Depends(require_role(RoleEnum.admin, RoleEnum.superadmin)), Depends(rate_limit("10/minute"))])
+async def bulk_create_users(
+    body: UserBulkCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    _check_batch_size(len(body.items))
+    logger.info("bulk_create_users called with {} items by user: {}", len(body.items), current_user.id)
+    results = await repositories.bulk_create_users_async(db, body.items, creator_role=current_user.role)
+    return await _finish_bulk(results, "created")
+
+
+# Update many users in one transaction; each item is authorized like PUT /{user_id}
+@router.patch("/bulk", response_model=BulkResult, dependencies=[Depends(rate_limit("10/minute"))])
+async def bulk_update_users(
+    body: UserBulkUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    _check_batch_size(len(body.items))
+    logger.info("bulk_update_users called with {} items by user: {}", len(body.items), current_user.id)
+    results = await repositories.bulk_update_users_async(db, body.items, current_user.id, current_user.role)
+    return await _finish_bulk(results, "updated")
+
+
+# Delete many users in one statement; only superadmin can perform this action
+@router.delete("/bulk", response_model=BulkResult, dependencies=[Depends(require_role(RoleEnum.superadmin)), Depends(rate_limit("10/minute"))])
+async def bulk_delete_users(
+    body: UserBulkDelete,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    _check_batch_size(len(body.ids))
+    logger.info("bulk_delete_users called with {} ids by user: {}", len(body.ids), current_user.id)
+    results = await repositories.bulk_delete_users_async(db, body.ids, deleter_role=current_user.role)
+    return await _finish_bulk(results, "deleted")
+
+
 # Retrieve a user by ID; accessible by users, admins, and superadmins
 @router.get("/{user_id}", response_model=UserOut,dependencies=[Depends(require_role(RoleEnum.user, RoleEnum.admin, RoleEnum.superadmin))])
 def read_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
 ):
-    logger.info(f"read_user called with user_id: {user_id}")
-    db_user = repositories.get_user(db, user_id)
-    if not db_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+    logger.info("read_user called with user_id: {}", user_id)
+    # Conditional requests are answered from the version columns alone when nothing changed
+    if request.headers.get("if-none-match"):
+        version, updated_at = repositories.get_user_version(db, user_id)
+        etag = row_etag(user_id, version)
+        if etag_matches(request, etag):
+            return not_modified(etag, updated_at)
+    user = repositories.get_user_row(db, user_id)
+    etag = row_etag(user_id, user.pop("version"))
+    return ORJSONResponse(user, headers=validator_headers(etag, user.pop("updated_at")))
 
 
 # Update an existing user; publishes update event for subscribers
@@ -89,34 +274,25 @@ def read_user(
 async def update_user(
     user_id: int, 
     user: UserUpdate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    logger.info(f"update_user called for user_id: {user_id} by user: {current_user.id}")
-    user = repositories.update_user(db,user_id,current_user.id,current_user.role,user)
-    await manager.broadcast_event({
-        "type": "updated",
-        "user": UserOut.from_orm(user).dict()
-    })
+    logger.info("update_user called for user_id: {} by user: {}", user_id, current_user.id)
+    user = await repositories.update_user_async(db,user_id,current_user.id,current_user.role,user)
+    await manager.broadcast_event(user_event("updated", user))
     return user
 
 # Delete a user by ID; only superadmin allowed
-@router.delete("/{user_id}",dependencies=[Depends(require_role(RoleEnum.superadmin))])
-@limiter.limit("10/minute")
+@router.delete("/{user_id}",dependencies=[Depends(require_role(RoleEnum.superadmin)), Depends(rate_limit("10/minute"))])
 async def delete_user(
-    request: Request,
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    logger.info(f"delete_user called for user_id: {user_id} by user: {current_user.id}")
-    user = repositories.get_user(db, user_id)
-    repositories.delete_user(db, user_id, current_user.role)
-    await manager.broadcast_event({
-        "type": "deleted",
-        "user": UserOut.from_orm(user).dict()
-    })
-    logger.info(f"User {user_id} successfully deleted by user: {current_user.id}")
+    logger.info("delete_user called for user_id: {} by user: {}", user_id, current_user.id)
+    user = await repositories.delete_user_async(db, user_id, current_user.role)
+    await manager.broadcast_event(user_event("deleted", user))
+    logger.info("User {} successfully deleted by user: {}", user_id, current_user.id)
     return {"ok": True}
 
 
@@ -128,17 +304,32 @@ async def websocket_endpoint(ws: WebSocket):
       {"action":"subscribe_id", "user_id":17}
       {"action":"subscribe_search", "email":"@gmail.com"}
     Then they’ll receive events when matching users are created/updated/deleted.
+
+    To receive coalesced batches ({"type":"batch","events":[...]}) instead of one
+    frame per event, send {"action":"set_delivery", "mode":"batched"}
+    ("immediate" switches back). Malformed messages are answered with
+    {"type":"error","detail":...} and leave the subscriptions as they were.
     """
     await manager.connect(ws)
     try:
         while True:
-            msg = await ws.receive_json()
-            action = msg.get("action")
-            if action == "subscribe_id":
-                manager.subscribe_to_id(ws, int(msg["user_id"]))
-            elif action == "subscribe_search":
-                # remove 'action' key, the rest are filters
-                filters = {k: v for k, v in msg.items() if k != "action"}
-                manager.subscribe_to_search(ws, filters)
+            try:
+                msg = json.loads(await ws.receive_text())
+                action = msg.get("action")
+                if action == "subscribe_id":
+                    manager.subscribe_to_id(ws, int(msg["user_id"]))
+                elif action == "subscribe_search":
+                    # remove 'action' key, the rest are filters
+                    filters = {k: v for k, v in msg.items() if k != "action"}
+                    manager.subscribe_to_search(ws, filters)
+                elif action == "set_delivery":
+                    manager.set_batched(ws, msg.get("mode") == "batched")
+                else:
+                    manager.reject(ws, f"Unknown action: {action}")
+            except (ValueError, TypeError, KeyError, AttributeError):
+                # Malformed message (not a JSON object, missing or non-integer user_id); the connection stays open
+                manager.reject(ws, "Malformed subscription message")
     except WebSocketDisconnect:
-        manager.disconnect(ws)
\ No newline at end of file
+        pass
+    finally:
+        manager.disconnect(ws)
@@ -1,3 +1,5 @@
+from datetime import datetime
+from typing import Literal
 from pydantic import BaseModel, EmailStr, constr, IPvAnyAddress
 from enum import Enum
 
@@ -58,3 +60,70 @@ class UserOut(BaseModel):
     model_config = {
         "from_attributes": True  
     }
+
+
+# Schema for offset paginated user listings (/list, /search)
+class UserPage(BaseModel):
+    items:    list[UserOut]
+    # Exact, cached or estimated depending on COUNT_STRATEGY; None when counting is disabled
+    total:    int | None = None
+    page:     int
+    size:     int
+    pages:    int | None = None
+    has_next: bool
+
+
+# Schema for keyset (cursor) paginated user listings
+class UserCursorPage(BaseModel):
+    items:       list[UserOut]
+    size:        int
+    next_cursor: str | None = None
+
+
+# One entry of the change feed; `user` is the state after the change, None for deletes
+class UserChangeOut(BaseModel):
+    type:       Literal["created", "updated", "deleted"]
+    user_id:    int
+    user:       UserOut | None = None
+    changed_at: datetime
+
+
+# Schema for a page of the change feed; pass `next_cursor` back as `since` to resume
+class UserChangePage(BaseModel):
+    changes:     list[UserChangeOut]
+    next_cursor: str
+    has_more:    bool
+
+
+# One item of a bulk update: the target user's ID plus the fields to change
+class UserBulkUpdateItem(UserUpdate):
+    id: int
+
+
+# Request bodies for the /bulk endpoints
+class UserBulkCreate(BaseModel):
+    items: list[UserCreate]
+
+
+class UserBulkUpdate(BaseModel):
+    items: list[UserBulkUpdateItem]
+
+
+class UserBulkDelete(BaseModel):
+    ids: list[int]
+
+
+# Outcome of one item of a bulk request, in request order
+class BulkItemResult(BaseModel):
+    index:  int
+    id:     int | None = None
+    status: int
+    detail: str | None = None
+    user:   UserOut | None = None
+
+
+# Response of the /bulk endpoints
+class BulkResult(BaseModel):
+    results:   list[BulkItemResult]
+    succeeded: int
+    failed:    int
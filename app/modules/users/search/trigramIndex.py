@@ -0,0 +1,296 @@
+import asyncio
+import sys
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import select
+
+from app.common.config.config import FromSettings, settings
+from app.common.db.session import SessionLocal, get_engine
+from app.common.notifications.bus import USER_EVENTS, event_bus, user_events
+from app.modules.users.repositories.usersRepo import WRITTEN_COLUMNS
+
+# Fields stored per user, in UserOut order; the first three are substring-searchable
+FIELDS = ("id", "first_name", "last_name", "email", "gender", "ip_address", "role")
+SUBSTRING_FIELDS = ("first_name", "last_name", "email")
+STORED_FIELDS = FIELDS[1:]
+
+# Posting lists above this size are intersected with the next smallest before verification
+INTERSECT_THRESHOLD = 2_000
+# Rows loaded per round trip while building
+BUILD_BATCH_SIZE = 10_000
+
+EMPTY_POSTINGS = array("I")
+# Accounted size of a new posting list and of its entry in the postings dict (hash, key and value pointers)
+POSTINGS_BYTES = sys.getsizeof(EMPTY_POSTINGS) + 3 * 8
+
+
+# Distinct lowercase trigrams of a string
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _Store:
+    """
+    Array-backed document store and trigram postings.
+
+    Every indexed user occupies a slot. Field values are kept UTF-8 encoded in one
+    bytearray per field with an offsets array, and postings are arrays of slot
+    numbers keyed by field prefix + trigram. Updates append a new slot and mark
+    the old one dead; dead slots are dropped by compaction. The row version of
+    every user ever seen (deleted ones included) is kept so stale events can be
+    recognized. `memory_bytes` is
+    kept up to date as slots and postings are added (nothing is freed until
+    compaction builds a new store), so checking the budget costs nothing.
+    """
+    def __init__(self):
+        self.slot_ids = array("q")
+        self.blobs = {f: bytearray() for f in STORED_FIELDS}
+        self.offsets = {f: array("Q", [0]) for f in STORED_FIELDS}
+        self.postings: Dict[str, array] = {}
+        # user id -> slot + 1 (0 = not indexed); ids are dense primary keys
+        self.id_slots = array("I")
+        # user id -> row version of the indexed (or deleted) user; 0 = unknown
+        self.versions = array("I")
+        self.live = 0
+        self.dead = 0
+        self.memory_bytes = (
+            sys.getsizeof(self.postings) + sys.getsizeof(self.slot_ids)
+            + sys.getsizeof(self.id_slots) + sys.getsizeof(self.versions)
+            + sum(sys.getsizeof(offsets) for offsets in self.offsets.values())
+        )
+
+    def value(self, slot: int, field: str) -> str:
+        offsets = self.offsets[field]
+        return self.blobs[field][offsets[slot]:offsets[slot + 1]].decode()
+
+    def row(self, slot: int) -> Dict[str, Any]:
+        row = {"id": self.slot_ids[slot]}
+        for field in STORED_FIELDS:
+            row[field] = self.value(slot, field)
+        return row
+
+    def version(self, user_id: int) -> int:
+        return self.versions[user_id] if user_id < len(self.versions) else 0
+
+    # Grow the per-id arrays to cover `user_id`
+    def _reserve(self, user_id: int) -> None:
+        if user_id < len(self.id_slots):
+            return
+        grow = user_id + 1 - len(self.id_slots)
+        self.id_slots.extend([0] * grow)
+        self.versions.extend([0] * grow)
+        self.memory_bytes += grow * (self.id_slots.itemsize + self.versions.itemsize)
+
+    def add(self, user: Dict[str, Any], version: int = 0) -> None:
+        user_id = int(user["id"])
+        self.remove(user_id, version)
+        slot = len(self.slot_ids)
+        self.slot_ids.append(user_id)
+        added = self.slot_ids.itemsize
+        for field in STORED_FIELDS:
+            value = user.get(field)
+            value = "" if value is None else str(getattr(value, "value", value))
+            encoded = value.encode()
+            self.blobs[field] += encoded
+            self.offsets[field].append(len(self.blobs[field]))
+            added += len(encoded) + self.offsets[field].itemsize
+            if field in SUBSTRING_FIELDS:
+                prefix = field[0]
+                for trigram in trigrams(value.lower()):
+                    key = prefix + trigram
+                    postings = self.postings.get(key)
+                    if postings is None:
+                        postings = self.postings[key] = array("I")
+                        added += sys.getsizeof(key) + POSTINGS_BYTES
+                    postings.append(slot)
+                    added += postings.itemsize
+        self.id_slots[user_id] = slot + 1
+        self.live += 1
+        self.memory_bytes += added
+
+    def remove(self, user_id: int, version: int = 0) -> None:
+        self._reserve(user_id)
+        self.versions[user_id] = version
+        if not self.id_slots[user_id]:
+            return
+        slot = self.id_slots[user_id] - 1
+        self.slot_ids[slot] = -1
+        self.id_slots[user_id] = 0
+        self.live -= 1
+        self.dead += 1
+
+    def compacted(self) -> "_Store":
+        store = _Store()
+        for slot, user_id in enumerate(self.slot_ids):
+            if user_id >= 0:
+                store.add(self.row(slot), self.versions[user_id])
+        store._reserve(len(self.versions) - 1)
+        store.versions[:] = self.versions
+        return store
+
+
+class TrigramSearchIndex:
+    """
+    Optional in-process index answering /search substring filters without Postgres.
+
+    Built once at startup by streaming the users table, then kept current by the
+    same user events that feed WebSocket subscribers. Queries that can't be served
+    exactly (no filter of 3+ characters, or ILIKE wildcards in a term) return None
+    so callers fall back to the database. If the index outgrows its memory budget,
+    or the build fails, it disables itself.
+    """
+    max_memory_bytes = FromSettings("search_index_max_memory_mb", lambda mb: mb * 1024 * 1024)
+
+    def __init__(self, max_memory_bytes: int | None = None):
+        self.max_memory_bytes = max_memory_bytes
+        self._store = _Store()
+        self._lock = threading.Lock()
+        self.ready = False
+        self.disabled = False
+        # Events received while a build is running, replayed once it finishes
+        self._pending: Optional[List[Dict[str, Any]]] = None
+        self.build_seconds: Optional[float] = None
+
+    def build(self) -> None:
+        """Stream every user from the database into a fresh store and swap it in."""
+        with self._lock:
+            self._pending = []
+        started = time.perf_counter()
+        store = _Store()
+        get_engine()
+        db = SessionLocal()
+        try:
+            result = db.execute(select(*WRITTEN_COLUMNS).execution_options(yield_per=BUILD_BATCH_SIZE))
+            for partition in result.mappings().partitions():
+                for row in partition:
+                    store.add(row, row["version"])
+                if store.memory_bytes > self.max_memory_bytes:
+                    logger.warning("Search index exceeded its memory budget after {} users; disabled", store.live)
+                    with self._lock:
+                        self._pending = None
+                        self.disabled = True
+                    return
+        except Exception:
+            # Stop buffering events for a build that won't finish; /search keeps using Postgres
+            with self._lock:
+                self._pending = None
+                self.disabled = True
+            raise
+        finally:
+            db.close()
+
+        with self._lock:
+            for event in self._pending:
+                self._apply(store, event)
+            self._store = store
+            self._pending = None
+            self.ready = True
+            self.build_seconds = time.perf_counter() - started
+        logger.info("Search index built: {} users in {:.1f}s", store.live, self.build_seconds)
+
+    def apply_events(self, events: List[Dict[str, Any]]) -> None:
+        """Apply created/updated/deleted user events in order."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(events)
+            elif self.ready:
+                for event in events:
+                    self._apply(self._store, event)
+                if self._store.dead > max(1_000, self._store.live // 2):
+                    self._store = self._store.compacted()
+                if self._store.memory_bytes > self.max_memory_bytes:
+                    logger.warning("Search index exceeded its memory budget; disabled")
+                    self.ready = False
+                    self.disabled = True
+                    self._store = _Store()
+
+    @staticmethod
+    def _apply(store: _Store, event: Dict[str, Any]) -> None:
+        user_id = int(event["user"]["id"])
+        version = event.get("version", 0)
+        # Skip events older than the indexed row (published late by another worker, or already
+        # part of the build's snapshot); events without a version always apply
+        if version and version <= store.version(user_id):
+            return
+        if event["type"] == "deleted":
+            store.remove(user_id, version)
+        else:
+            store.add(event["user"], version)
+
+    def search(self, filters: Dict[str, Optional[str]], limit: Optional[int], offset: int = 0) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+        """Return (page of rows ordered by id, total), or None if the database should answer."""
+        if not self.ready:
+            return None
+        terms = [(field, str(filters[field]).lower()) for field in SUBSTRING_FIELDS if filters.get(field)]
+        # ILIKE treats % and _ as wildcards; leave those queries to Postgres
+        if any("%" in term or "_" in term for _, term in terms):
+            return None
+        keys = [field[0] + trigram for field, term in terms for trigram in trigrams(term)]
+        if not keys:
+            return None
+        gender = filters.get("gender")
+        ip_address = filters.get("ip_address")
+
+        with self._lock:
+            store = self._store
+            postings = sorted((store.postings.get(key, EMPTY_POSTINGS) for key in keys), key=len)
+            candidates = postings[0]
+            if len(candidates) > INTERSECT_THRESHOLD and len(postings) > 1:
+                candidates = set(candidates)
+                for more in postings[1:]:
+                    candidates.intersection_update(more)
+                    if len(candidates) <= INTERSECT_THRESHOLD:
+                        break
+
+            matches = []
+            for slot in candidates:
+                user_id = store.slot_ids[slot]
+                if user_id < 0:
+                    continue
+                if not all(term in store.value(slot, field).lower() for field, term in terms):
+                    continue
+                if gender and store.value(slot, "gender").lower() != gender.lower():
+                    continue
+                if ip_address and store.value(slot, "ip_address") != ip_address:
+                    continue
+                matches.append((user_id, slot))
+
+            matches.sort()
+            page = matches[offset:offset + limit] if limit is not None else matches[offset:]
+            return [store.row(slot) for _, slot in page], len(matches)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "disabled": self.disabled,
+                "users": self._store.live,
+                "dead_slots": self._store.dead,
+                "trigrams": len(self._store.postings),
+                "memory_bytes": self._store.memory_bytes,
+                "build_seconds": self.build_seconds,
+            }
+
+
+search_index = TrigramSearchIndex()
+
+
+# Build the index in a worker thread so startup and the event loop aren't blocked
+async def build_search_index() -> None:
+    try:
+        await asyncio.to_thread(search_index.build)
+    except Exception:
+        logger.exception("Search index build failed; /search will use the database")
+
+
+# Keep the index in sync with user writes from every worker
+async def apply_user_event(payload: Dict[str, Any]) -> None:
+    if settings.search_index_enabled and not search_index.disabled:
+        await asyncio.to_thread(search_index.apply_events, user_events(payload))
+
+
+event_bus.subscribe(USER_EVENTS, apply_user_event)
@@ -0,0 +1,55 @@
+import statistics
+import subprocess
+import time
+from typing import Callable, Iterable
+
+
+# Return the p-th percentile (0-100) of a list of samples using nearest-rank
+def percentile(samples: list[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+# Summarize latency samples (in seconds) as milliseconds
+def summarize(samples: list[float]) -> dict[str, float]:
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+# Call `fn` once per argument set, repeated `rounds` times, and return the latency samples
+def measure(fn: Callable, args: Iterable, rounds: int = 1) -> list[float]:
+    args = list(args)
+    samples = []
+    for _ in range(rounds):
+        for a in args:
+            start = time.perf_counter()
+            fn(a)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+# Pretty-print a summary produced by summarize()
+def print_summary(label: str, summary: dict[str, float]) -> None:
+    print(
+        f"{label:<28} n={summary['count']:<6} "
+        f"mean={summary['mean_ms']:.2f}ms p50={summary['p50_ms']:.2f}ms "
+        f"p95={summary['p95_ms']:.2f}ms p99={summary['p99_ms']:.2f}ms"
+    )
+
+
+# Current git revision, if available
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--tags", "--always", "--dirty"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
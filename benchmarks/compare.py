@@ -0,0 +1,78 @@
+"""
+Compare two load-test reports written by benchmarks/loadtest.py.
+
+Prints throughput and p50/p95/p99 latency per scenario side by side. Exits with
+status 1 when a scenario in the candidate is slower than the baseline by more
+than --threshold percent: lower throughput or a higher latency percentile.
+
+    python -m benchmarks.compare loadtest-v1.2.json loadtest-HEAD.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# (label, key in the scenario result, True when higher is better)
+METRICS = [
+    ("req/s", "throughput_rps", True),
+    ("p50 ms", "p50_ms", False),
+    ("p95 ms", "p95_ms", False),
+    ("p99 ms", "p99_ms", False),
+]
+
+
+# Value of one metric in a scenario result
+def metric(result: dict, key: str) -> float:
+    return result[key] if key in result else result["latency"][key]
+
+
+# Percent change from `old` to `new`, signed so that positive means worse
+def regression(old: float, new: float, higher_is_better: bool) -> float:
+    if not old:
+        return 0.0
+    change = (new - old) / old * 100
+    return -change if higher_is_better else change
+
+
+# Print the comparison table; returns the list of regressions above the threshold
+def compare(baseline: dict, candidate: dict, threshold: float) -> list[str]:
+    regressions = []
+    print(f"baseline  {baseline.get('revision')}  ({baseline['config']['rows']} rows)")
+    print(f"candidate {candidate.get('revision')}  ({candidate['config']['rows']} rows)")
+    if baseline["config"] != candidate["config"]:
+        changed = sorted(k for k in baseline["config"].keys() | candidate["config"].keys()
+                         if baseline["config"].get(k) != candidate["config"].get(k))
+        print(f"warning: the runs used different settings ({', '.join(changed)})")
+    print()
+    print(f"{'scenario':<14} {'metric':<8} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for name, old in baseline["scenarios"].items():
+        new = candidate["scenarios"].get(name)
+        if new is None:
+            print(f"{name:<14} missing from candidate")
+            continue
+        for label, key, higher_is_better in METRICS:
+            before, after = metric(old, key), metric(new, key)
+            worse = regression(before, after, higher_is_better)
+            flag = " !" if worse > threshold else ""
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"{name:<14} {label:<8} {before:>12.2f} {after:>12.2f} {change:>+8.1f}%{flag}")
+            if flag:
+                regressions.append(f"{name} {label} {change:+.1f}%")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change reported as a regression")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    regressions = compare(baseline, candidate, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:g}%: " + "; ".join(regressions))
+        sys.exit(1)
+    print(f"\nno regressions above {args.threshold:g}%")
@@ -0,0 +1,330 @@
+"""
+Load test of a running service: the hot HTTP paths and WebSocket fan-out.
+
+Seeds the database in DATABASE_URL to --rows users (see benchmarks/seed.py), adds
+--principals load-test accounts (admins, the first one a superadmin) and --victims
+users for the delete scenario, then drives each scenario for --duration seconds
+with --concurrency closed-loop clients against --base-url:
+
+    auth     POST /auth/token as a random principal
+    list     GET /users/list on one of the first --list-pages pages
+    search   GET /users/search with a first name or email term from mock_data.csv
+    get      GET /users/{id} for a random id
+    update   PUT /users/{id}, each client renaming its own principal
+    delete   DELETE /users/{id} of a victim, until they run out
+
+While `update` runs, --ws-clients WebSocket clients subscribe to the principals'
+updates and the time from each PUT to its delivery is reported as `ws_delivery`.
+Throughput counts 2xx/304 responses, and latency percentiles are taken over them.
+Every other status is listed under `statuses`.
+
+Start the server with RATE_LIMIT_ENABLED=false, or most requests come back 429.
+Record one JSON file per commit and compare them with benchmarks/compare.py:
+
+    python -m benchmarks.loadtest --rows 100000 --json loadtest-$(git describe --tags --always).json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import time
+from collections import Counter
+from typing import Callable, Optional
+
+import httpx
+import pandas as pd
+import websockets
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Engine
+
+from app.models.userModel import User
+from app.modules.auth.token.token import hash_password
+from app.modules.users.schemas.userSchema import RoleEnum
+from benchmarks.common import git_revision, print_summary, summarize
+from benchmarks.seed import CSV_FILE_PATH, DEFAULT_PLAIN_PASSWORD, seed_users
+
+SCENARIOS = ["auth", "list", "search", "get", "update", "delete"]
+PAGE_SIZE = 50
+
+# (method, path, httpx request kwargs), or None when the scenario has nothing left to send
+Request = Optional[tuple[str, str, dict]]
+
+
+# Insert (or reset the role of) the load-test accounts; returns their (id, email) pairs
+def create_principals(engine: Engine, count: int, hashed_password: str) -> list[tuple[int, str]]:
+    rows = [
+        {
+            "first_name": "Load",
+            "last_name": f"Test{n}",
+            "email": f"loadtest{n}@example.com",
+            "gender": "Female",
+            "ip_address": f"10.255.{n // 256 % 256}.{n % 256}",
+            "hashed_password": hashed_password,
+            "role": RoleEnum.superadmin if n == 0 else RoleEnum.admin,
+        }
+        for n in range(count)
+    ]
+    stmt = pg_insert(User.__table__).values(rows)
+    stmt = stmt.on_conflict_do_update(index_elements=["email"], set_={"role": stmt.excluded.role})
+    with engine.begin() as conn:
+        result = conn.execute(stmt.returning(User.id, User.email)).all()
+    return sorted((row.id, row.email) for row in result)
+
+
+# Insert the users removed by the delete scenario; returns their ids
+def create_victims(engine: Engine, count: int, hashed_password: str) -> list[int]:
+    if not count:
+        return []
+    rows = [
+        {
+            "first_name": "Victim",
+            "last_name": f"Test{n}",
+            "email": f"loadtest-victim{n}@example.com",
+            "gender": "Male",
+            "ip_address": f"10.254.{n // 256 % 256}.{n % 256}",
+            "hashed_password": hashed_password,
+            "role": RoleEnum.user,
+        }
+        for n in range(count)
+    ]
+    stmt = pg_insert(User.__table__).values(rows).on_conflict_do_nothing(index_elements=["email"])
+    with engine.begin() as conn:
+        conn.execute(stmt)
+        return conn.execute(
+            select(User.id).where(User.email.like("loadtest-victim%")).order_by(User.id)
+        ).scalars().all()
+
+
+# Search terms of 3+ characters taken from the mock data (first names and email domains)
+def search_terms() -> list[tuple[str, str]]:
+    df = pd.read_csv(CSV_FILE_PATH)
+    names = [name for name in df["first_name"].dropna().unique() if len(name) >= 3][:200]
+    domains = df["email"].str.split("@").str[1].dropna().unique()[:200]
+    return [("first_name", name) for name in names] + [("email", domain) for domain in domains]
+
+
+# Run `make_request` from `concurrency` closed-loop clients for `duration` seconds
+async def run_scenario(
+    client: httpx.AsyncClient,
+    make_request: Callable[[int, random.Random], Request],
+    concurrency: int,
+    duration: float,
+    seed: int,
+    on_sent: Optional[Callable[[dict, float], None]] = None,
+) -> dict:
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    deadline = time.perf_counter() + duration
+
+    async def worker(n: int):
+        rng = random.Random(seed * 1_000_003 + n)
+        while time.perf_counter() < deadline:
+            request = make_request(n, rng)
+            if request is None:
+                return
+            method, path, kwargs = request
+            started = time.perf_counter()
+            if on_sent is not None:
+                on_sent(kwargs, started)
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            if status in (200, 201, 204, 304):
+                latencies.append(time.perf_counter() - started)
+            statuses[str(status)] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": sum(statuses.values()),
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "statuses": dict(statuses),
+        "latency": summarize(latencies),
+    }
+
+
+class DeliveryTracker:
+    """Matches user events received over WebSocket with the PUTs that caused them."""
+    def __init__(self):
+        self.sent: dict[str, float] = {}
+        self.latencies: list[float] = []
+        self.frames = 0
+
+    def on_sent(self, kwargs: dict, started: float) -> None:
+        self.sent[kwargs["json"]["first_name"]] = started
+
+    async def listen(self, url: str, ready: asyncio.Event, subscribed: list) -> None:
+        async with websockets.connect(url, max_queue=None) as ws:
+            await ws.send(json.dumps({"action": "subscribe_search", "email": "loadtest"}))
+            subscribed.append(ws)
+            ready.set()
+            async for raw in ws:
+                received = time.perf_counter()
+                self.frames += 1
+                message = json.loads(raw)
+                events = message["events"] if message.get("type") == "batch" else [message]
+                for event in events:
+                    started = self.sent.get(event["user"]["first_name"])
+                    if started is not None:
+                        self.latencies.append(received - started)
+
+
+# Run the update scenario with WebSocket listeners attached; returns (update, ws_delivery) results
+async def run_update_with_listeners(
+    client: httpx.AsyncClient, ws_url: str, ws_clients: int, make_request, args, seed: int, drain: float = 2.0,
+) -> tuple[dict, dict]:
+    tracker = DeliveryTracker()
+    subscribed: list = []
+    listeners = []
+    for _ in range(ws_clients):
+        ready = asyncio.Event()
+        listeners.append(asyncio.create_task(tracker.listen(ws_url, ready, subscribed)))
+        await ready.wait()
+    # Subscriptions are registered asynchronously by the server
+    await asyncio.sleep(0.5)
+
+    started = time.perf_counter()
+    update = await run_scenario(client, make_request, args.concurrency, args.duration, seed, tracker.on_sent)
+    await asyncio.sleep(drain)
+    elapsed = time.perf_counter() - started
+    for ws in subscribed:
+        await ws.close()
+    await asyncio.gather(*listeners, return_exceptions=True)
+
+    delivery = {
+        "clients": ws_clients,
+        "expected": update["statuses"].get("200", 0) * ws_clients,
+        "delivered": len(tracker.latencies),
+        "frames": tracker.frames,
+        "seconds": elapsed,
+        "throughput_rps": len(tracker.latencies) / elapsed,
+        "latency": summarize(tracker.latencies),
+    }
+    return update, delivery
+
+
+async def run(args, principals: list[tuple[int, str]], victims: list[int], id_range: tuple[int, int], users: int) -> dict:
+    terms = search_terms()
+    pages = max(1, min(args.list_pages, users // PAGE_SIZE))
+    victims = list(victims)
+    api = args.base_url.rstrip("/") + "/api/v1"
+    ws_url = api.replace("http", "ws", 1) + "/users/ws"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=api, limits=limits, timeout=30.0) as client:
+        # One token per principal; client n acts as principal n % len(principals)
+        async def login(email: str) -> str:
+            response = await client.post("/auth/token", data={"username": email, "password": DEFAULT_PLAIN_PASSWORD})
+            response.raise_for_status()
+            return response.json()["access_token"]
+
+        tokens = await asyncio.gather(*(login(email) for _, email in principals))
+        headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+        superadmin = headers[0]
+
+        def principal(n: int) -> int:
+            return n % len(principals)
+
+        def auth(n, rng):
+            _, email = principals[rng.randrange(len(principals))]
+            return "POST", "/auth/token", {"data": {"username": email, "password": DEFAULT_PLAIN_PASSWORD}}
+
+        def list_page(n, rng):
+            params = {"page": rng.randint(1, pages), "size": PAGE_SIZE}
+            return "GET", "/users/list", {"params": params, "headers": headers[principal(n)]}
+
+        def search(n, rng):
+            field, term = rng.choice(terms)
+            return "GET", "/users/search", {"params": {field: term, "size": PAGE_SIZE}, "headers": headers[principal(n)]}
+
+        def get(n, rng):
+            return "GET", f"/users/{rng.randint(*id_range)}", {"headers": headers[principal(n)]}
+
+        counter = iter(range(10**12))
+
+        def update(n, rng):
+            user_id, _ = principals[principal(n)]
+            body = {"first_name": f"Load{next(counter)}"}
+            return "PUT", f"/users/{user_id}", {"json": body, "headers": headers[principal(n)]}
+
+        def delete(n, rng):
+            if not victims:
+                return None
+            return "DELETE", f"/users/{victims.pop()}", {"headers": superadmin}
+
+        makers = {"auth": auth, "list": list_page, "search": search, "get": get, "update": update, "delete": delete}
+        results = {}
+        for seed, name in enumerate(args.scenarios):
+            if args.warmup and name != "delete":
+                await run_scenario(client, makers[name], args.concurrency, args.warmup, args.seed + seed)
+            if name == "update" and args.ws_clients:
+                results[name], results["ws_delivery"] = await run_update_with_listeners(
+                    client, ws_url, args.ws_clients, makers[name], args, args.seed + seed,
+                )
+                print_summary("ws_delivery", results["ws_delivery"]["latency"])
+            else:
+                results[name] = await run_scenario(client, makers[name], args.concurrency, args.duration, args.seed + seed)
+            print_summary(f"{name} ({results[name]['throughput_rps']:,.0f} req/s)", results[name]["latency"])
+    return results
+
+
+if __name__ == "__main__":
+    from app.common.db.session import get_engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rows", type=int, default=100_000, help="seed the users table to this size (e.g. 10000, 100000, 1000000)")
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=SCENARIOS, help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unrecorded seconds before each scenario")
+    parser.add_argument("--principals", type=int, default=32, help="load-test accounts the clients log in as")
+    parser.add_argument("--victims", type=int, default=5_000, help="users created for the delete scenario")
+    parser.add_argument("--ws-clients", type=int, default=100, help="WebSocket clients listening during the update scenario")
+    parser.add_argument("--list-pages", type=int, default=100, help="/users/list requests spread over this many leading pages")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for request parameters")
+    parser.add_argument("--json", default=None, help="write the results to this file")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    engine = get_engine()
+    started = time.perf_counter()
+    users = seed_users(engine, args.rows)
+    hashed = hash_password(DEFAULT_PLAIN_PASSWORD)
+    principals = create_principals(engine, max(1, args.principals), hashed)
+    victims = create_victims(engine, args.victims if "delete" in args.scenarios else 0, hashed)
+    with engine.connect() as conn:
+        id_range = tuple(conn.execute(select(func.min(User.id), func.max(User.id))).one())
+    print(f"users table holds {users} rows, {len(principals)} principals, {len(victims)} victims ({time.perf_counter() - started:.1f}s)")
+
+    results = asyncio.run(run(args, principals, victims, id_range, users))
+
+    if args.json:
+        report = {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "config": {
+                "base_url": args.base_url,
+                "rows": args.rows,
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+                "warmup": args.warmup,
+                "principals": len(principals),
+                "ws_clients": args.ws_clients,
+                "seed": args.seed,
+            },
+            "scenarios": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.json}")
@@ -0,0 +1,105 @@
+"""
+Per-request cost of logging on the request path.
+
+Each simulated request runs inside a request context (as set by
+RequestContextMiddleware) and emits --lines INFO records like the user routes do.
+The sink is a stand-in for stdout that takes --sink-delay-us per write, which is
+what a slow log collector looks like from the process. Compared setups:
+
+    baseline          no log calls
+    sync text         the previous setup: f-strings, synchronous text sink, diagnose on
+    enqueued json     configure_logging(): lazy arguments, JSON lines handed to the BackgroundWriter thread
+    sampled 10%       the same with the route sampled at 0.1
+    level WARNING     INFO disabled: the call returns before formatting anything
+
+    python -m benchmarks.logging_overhead --requests 20000 --sink-delay-us 50
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+from loguru import logger
+
+from app.common.utils.context import RequestContext, request_context
+from app.common.utils.logger import TEXT_FORMAT, configure_logging
+from benchmarks.common import print_summary, summarize
+
+ROUTE = "/api/v1/users/{user_id}"
+
+
+class SlowSink:
+    """File-like sink that blocks for a fixed time per write, like a backed-up stdout pipe."""
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.writes = 0
+
+    def write(self, message: str) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        self.writes += 1
+
+    def flush(self) -> None:
+        pass
+
+
+# Emit `lines` records the old way (eager f-strings)
+def log_eager(user_id: int, lines: int) -> None:
+    for _ in range(lines):
+        logger.info(f"read_user called with user_id: {user_id}")
+
+
+# Emit `lines` records with lazily formatted arguments
+def log_lazy(user_id: int, lines: int) -> None:
+    for _ in range(lines):
+        logger.info("read_user called with user_id: {}", user_id)
+
+
+def no_logging(user_id: int, lines: int) -> None:
+    pass
+
+
+# Per-request latency samples of `emit` inside a fresh request context each time
+def run(emit, requests: int, lines: int) -> list[float]:
+    scope = {"route": SimpleNamespace(path=ROUTE)}
+    samples = []
+    for n in range(requests):
+        token = request_context.set(RequestContext(f"req-{n}", "GET", scope))
+        started = time.perf_counter()
+        emit(n, lines)
+        samples.append(time.perf_counter() - started)
+        request_context.reset(token)
+    return samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--lines", type=int, default=2, help="log records per request")
+    parser.add_argument("--sink-delay-us", type=float, default=50.0, help="time each sink write blocks")
+    args = parser.parse_args()
+    delay = args.sink_delay_us / 1e6
+
+    # The service setup with explicit arguments, so no settings are needed
+    def service_logging(sink, level="INFO", sample_rate=1.0):
+        configure_logging(
+            sink, level=level, json=True, enqueue=True, queue_size=args.requests * args.lines,
+            diagnose=False, route_levels={}, route_sample_rates={ROUTE: sample_rate},
+        )
+
+    # (label, configure the sink, emit function)
+    setups = [
+        ("baseline", lambda sink: None, no_logging),
+        ("sync text", lambda sink: logger.add(sink, level="INFO", format=TEXT_FORMAT, colorize=False, diagnose=True), log_eager),
+        ("enqueued json", lambda sink: service_logging(sink), log_lazy),
+        ("sampled 10%", lambda sink: service_logging(sink, sample_rate=0.1), log_lazy),
+        ("level WARNING", lambda sink: service_logging(sink, level="WARNING"), log_lazy),
+    ]
+    for label, setup, emit in setups:
+        logger.remove()
+        logger.configure(extra={"request_id": "-"}, patcher=None)
+        sink = SlowSink(delay)
+        setup(sink)
+        summary = summarize(run(emit, args.requests, args.lines))
+        # Removing the handler waits for the writer thread to drain, outside the measured time
+        logger.remove()
+        print_summary(f"{label} ({sink.writes} writes)", summary)
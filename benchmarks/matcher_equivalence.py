@@ -0,0 +1,64 @@
+"""
+Randomized check that SearchMatcher matches exactly like the per-subscription check.
+
+Drives a SearchMatcher through --steps random subscribes, re-subscribes and
+unsubscribes (filters drawn from app/mock_data.csv, mixed case, sometimes empty
+or matching everything) and, after every step, matches a random user against it
+and against linear_match over the same subscriptions. The pending-pattern and
+stale-pattern paths are both exercised, since rebuilds only happen in batches.
+No database is needed.
+
+    python -m benchmarks.matcher_equivalence --steps 20000
+"""
+import argparse
+import random
+
+from app.common.notifications.matcher import SearchMatcher
+from benchmarks.ws_matching import CSV_PATH, FIELDS, linear_match, load_users, make_filters
+
+
+# Like ws_matching.make_filters, plus the odd case change, empty value or short/overlapping pattern
+def random_filters(rng: random.Random, users: list[dict]) -> dict:
+    roll = rng.random()
+    if roll < 0.05:
+        return {}
+    if roll < 0.1:
+        return {rng.choice(FIELDS): ""}
+    filters = make_filters(rng, users)
+    if roll < 0.3:
+        field = rng.choice(list(filters))
+        filters[field] = filters[field][:rng.randint(1, 2)]
+    if roll > 0.8:
+        filters = {field: value.upper() for field, value in filters.items()}
+    return filters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=20_000)
+    parser.add_argument("--keys", type=int, default=500, help="distinct subscription keys")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    users = load_users(CSV_PATH)
+    matcher = SearchMatcher()
+    subscriptions = {}
+    mismatches = 0
+    for step in range(args.steps):
+        key = rng.randrange(args.keys)
+        if key in subscriptions and rng.random() < 0.3:
+            matcher.remove(key)
+            del subscriptions[key]
+        else:
+            filters = random_filters(rng, users)
+            matcher.add(key, filters)
+            subscriptions[key] = filters
+        user = rng.choice(users)
+        if sorted(matcher.match(user)) != sorted(linear_match(subscriptions, user)):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"mismatch at step {step} for user {user['id']}")
+
+    print(f"{args.steps} steps, {len(matcher)} subscriptions at the end, {mismatches} mismatches")
+    raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,61 @@
+"""
+Page latency of /list and /search under each COUNT_STRATEGY.
+
+Seeds the database behind DATABASE_URL up to --rows users, then runs the
+repository calls behind both routes (one page of rows plus page_total) with the
+count strategy set to exact, cached, estimate and none, and prints p50/p95/p99
+per strategy. The cached phase is warm: its counts come from the cache after the
+first round.
+
+    python -m benchmarks.page_count --rows 1000000
+"""
+import argparse
+
+from app.common.config.config import get_settings
+from app.common.db.session import SessionLocal, engine
+from app.common.pagination.count import count_cache
+from app.modules.users.repositories import usersRepo
+from benchmarks.common import measure, print_summary, summarize
+from benchmarks.seed import seed_users
+
+STRATEGIES = ["exact", "cached", "estimate", "none"]
+
+# (filters, offset) pairs; empty filters is /list
+PAGES = [
+    ({}, 0),
+    ({}, 5_000),
+    ({"email": "@gmail.com"}, 0),
+    ({"first_name": "ann"}, 0),
+    ({"gender": "female"}, 100),
+]
+
+
+# One page of rows plus its total, as the routes fetch them
+def fetch_page(db, filters: dict, offset: int, page_size: int) -> None:
+    if filters:
+        usersRepo.search_users(db, **filters, limit=page_size + 1, offset=offset)
+    else:
+        usersRepo.get_users(db, limit=page_size + 1, offset=offset)
+    usersRepo.page_total(db, filters)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"users table holds {seed_users(engine, args.rows)} rows")
+    settings = get_settings()
+    db = SessionLocal()
+    try:
+        for strategy in STRATEGIES:
+            settings.count_strategy = strategy
+            count_cache.invalidate()
+            page = lambda p: fetch_page(db, p[0], p[1], args.page_size)
+            # Warm-up round, so every strategy runs against a hot buffer pool
+            measure(page, PAGES, rounds=1)
+            print_summary(strategy, summarize(measure(page, PAGES, rounds=args.rounds)))
+    finally:
+        db.close()
@@ -0,0 +1,57 @@
+"""
+Per-request overhead of the token-bucket rate limiter, and a cross-process check.
+
+Times --calls bucket takes against the in-process and the shared (memory-mapped,
+fcntl-locked) stores, over --keys distinct caller keys. It then starts --workers
+processes that hammer one "100/minute" key together and checks that about 100
+requests were allowed in total, not 100 per process.
+
+    python -m benchmarks.ratelimit_overhead
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from app.common.ratelimit.limiter import MemoryBucketStore, SharedBucketStore, parse_rate
+
+
+# Average cost of one take() in microseconds
+def time_store(store, calls: int, keys: int) -> float:
+    capacity, refill = parse_rate("100/minute")
+    names = [f"GET:/api/v1/users/list:user:{i}" for i in range(keys)]
+    started = time.perf_counter()
+    for i in range(calls):
+        store.take(names[i % keys], capacity, refill)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def _hammer(path: str, attempts: int, allowed) -> None:
+    store = SharedBucketStore(path, slots=1024)
+    capacity, refill = parse_rate("100/minute")
+    count = sum(1 for _ in range(attempts) if store.take("DELETE:/api/v1/users/{user_id}:user:1", capacity, refill) == 0)
+    with allowed.get_lock():
+        allowed.value += count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "buckets.bin")
+        print(f"memory store: {time_store(MemoryBucketStore(), args.calls, args.keys):.2f} us/request")
+        print(f"shared store: {time_store(SharedBucketStore(path, slots=65_536), args.calls, args.keys):.2f} us/request")
+
+        shared_path = os.path.join(tmp, "cross.bin")
+        allowed = multiprocessing.Value("i", 0)
+        procs = [multiprocessing.Process(target=_hammer, args=(shared_path, 500, allowed)) for _ in range(args.workers)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        print(f"{args.workers} processes x 500 requests on one 100/minute key: {allowed.value} allowed")
@@ -0,0 +1,58 @@
+"""
+Check that the shared rate limit store counts one bucket across processes.
+
+Starts --workers processes that each try --attempts requests on one key of a
+SharedBucketStore in a fresh file, with a rate slow enough ("100/day") that no
+tokens are refilled during the run. Exactly 100 requests must be allowed in
+total: fewer means a lost token, more means two processes spent the same one.
+Repeated --runs times. No database is needed.
+
+    python -m benchmarks.ratelimit_shared --workers 8 --runs 5
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+from app.common.ratelimit.limiter import SharedBucketStore, parse_rate
+
+RATE = "100/day"
+KEY = "DELETE:/api/v1/users/{user_id}:user:1"
+
+
+def _hammer(path: str, attempts: int, start, allowed) -> None:
+    store = SharedBucketStore(path, slots=1024)
+    capacity, refill = parse_rate(RATE)
+    start.wait()
+    count = sum(1 for _ in range(attempts) if store.take(KEY, capacity, refill) == 0)
+    with allowed.get_lock():
+        allowed.value += count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--attempts", type=int, default=200, help="requests per process")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    capacity = int(parse_rate(RATE)[0])
+    failed = 0
+    for run in range(args.runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "buckets.bin")
+            start = multiprocessing.Barrier(args.workers)
+            allowed = multiprocessing.Value("i", 0)
+            procs = [
+                multiprocessing.Process(target=_hammer, args=(path, args.attempts, start, allowed))
+                for _ in range(args.workers)
+            ]
+            for proc in procs:
+                proc.start()
+            for proc in procs:
+                proc.join()
+            failed += allowed.value != capacity
+            print(f"run {run + 1}: {args.workers} processes x {args.attempts} requests on one {RATE} key: {allowed.value} allowed")
+
+    print(f"{args.runs - failed}/{args.runs} runs allowed exactly {capacity}")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,129 @@
+"""
+Randomized check that the in-memory search index answers like the database.
+
+Loads users from app/mock_data.csv into a TrigramSearchIndex, then runs --rounds
+rounds of random created/updated/deleted events (delivered out of order, with
+stale duplicates, as several workers would publish them) followed by --queries
+random /search filters. Every page and total the index returns is compared with
+a plain model of the SQL query: ILIKE '%term%' on name and email, lower(gender)
+equality, exact ip_address, ordered by id. Queries the index hands back to the
+database (None) are counted but not compared. No database is needed.
+
+    python -m benchmarks.search_equivalence --rounds 50 --queries 200
+"""
+import argparse
+import random
+
+from app.modules.users.search.trigramIndex import SUBSTRING_FIELDS, TrigramSearchIndex
+from benchmarks.ws_matching import CSV_PATH, load_users
+
+GENDERS = ["Male", "Female", "Non-binary", "Agender"]
+
+
+# What `WHERE ... ORDER BY id LIMIT .. OFFSET ..` returns over the current rows
+def sql_search(rows: dict, filters: dict, limit: int, offset: int) -> tuple[list[int], int]:
+    matches = []
+    for user_id in sorted(rows):
+        user = rows[user_id]
+        if not all(filters[f].lower() in user[f].lower() for f in SUBSTRING_FIELDS if filters.get(f)):
+            continue
+        if filters.get("gender") and user["gender"].lower() != filters["gender"].lower():
+            continue
+        if filters.get("ip_address") and user["ip_address"] != filters["ip_address"]:
+            continue
+        matches.append(user_id)
+    return matches[offset:offset + limit], len(matches)
+
+
+# A random filter set: substrings of a real user's fields, sometimes with gender and ip
+def make_filters(rng: random.Random, users: list[dict]) -> dict:
+    user = rng.choice(users)
+    filters = {}
+    for field in rng.sample(SUBSTRING_FIELDS, rng.choice([1, 1, 2, 3])):
+        value = user[field]
+        size = min(len(value), rng.randint(2, 7))
+        start = rng.randint(0, len(value) - size)
+        term = value[start:start + size]
+        filters[field] = term.upper() if rng.random() < 0.2 else term
+    if rng.random() < 0.3:
+        filters["gender"] = rng.choice(GENDERS).lower()
+    if rng.random() < 0.1:
+        filters["ip_address"] = user["ip_address"]
+    return filters
+
+
+# A copy of `user` with one or two fields replaced by another user's values
+def mutate(rng: random.Random, user: dict, users: list[dict]) -> dict:
+    other = rng.choice(users)
+    changed = dict(user)
+    for field in rng.sample([*SUBSTRING_FIELDS, "gender"], rng.randint(1, 2)):
+        changed[field] = other[field]
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--events", type=int, default=100, help="events per round")
+    parser.add_argument("--queries", type=int, default=200, help="queries per round")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    users = [
+        {"id": int(u["id"]), "first_name": u["first_name"], "last_name": u["last_name"], "email": u["email"],
+         "gender": u["gender"], "ip_address": u["ip_address"], "role": "user"}
+        for u in load_users(CSV_PATH)
+    ]
+    # id -> (version, row) as committed in the database
+    committed = {u["id"]: (1, u) for u in users}
+
+    index = TrigramSearchIndex(max_memory_bytes=1 << 40)
+    index.ready = True
+    index.apply_events([{"type": "created", "user": u, "version": 1} for u in users])
+
+    next_id = len(users) + 1
+    compared = fallbacks = mismatches = 0
+    for _ in range(args.rounds):
+        events = []
+        for _ in range(args.events):
+            roll = rng.random()
+            live = list(committed)
+            if roll < 0.15 or not live:
+                user = {**mutate(rng, rng.choice(users), users), "id": next_id}
+                committed[next_id] = (1, user)
+                events.append({"type": "created", "user": user, "version": 1})
+                next_id += 1
+            elif roll < 0.3:
+                user_id = rng.choice(live)
+                version, _ = committed.pop(user_id)
+                events.append({"type": "deleted", "user": {"id": user_id}, "version": version + 1})
+            else:
+                user_id = rng.choice(live)
+                version, user = committed[user_id]
+                user = mutate(rng, user, users)
+                committed[user_id] = (version + 1, user)
+                events.append({"type": "updated", "user": user, "version": version + 1})
+        # Workers publish independently: reorder within a round and replay some events late
+        stale = rng.sample(events, len(events) // 10)
+        rng.shuffle(events)
+        index.apply_events(events + stale)
+
+        rows = {user_id: user for user_id, (_, user) in committed.items()}
+        for _ in range(args.queries):
+            filters = make_filters(rng, users)
+            limit, offset = rng.choice([10, 50, 100]), rng.choice([0, 0, 10, 50])
+            answer = index.search(filters, limit, offset)
+            if answer is None:
+                fallbacks += 1
+                continue
+            page, total = answer
+            compared += 1
+            if ([row["id"] for row in page], total) != sql_search(rows, filters, limit, offset):
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"mismatch for {filters} limit={limit} offset={offset}")
+
+    print(f"{compared} queries compared, {fallbacks} left to the database, {mismatches} mismatches")
+    print(f"index: {index.stats()}")
+    raise SystemExit(1 if mismatches else 0)
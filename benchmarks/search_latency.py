@@ -0,0 +1,101 @@
+"""
+Search latency before/after the pg_trgm GIN indexes.
+
+Seeds the database behind DATABASE_URL up to --rows users (1M by default), then
+runs the /search repository queries (page + count) first with the trigram
+indexes dropped and then with them created, and prints p50/p99 for each phase.
+A last phase builds the in-memory trigram index and answers the same queries from
+it (queries it can't serve fall back to Postgres, as /search does).
+
+Point DATABASE_URL at a scratch database: the trigram indexes are dropped and
+recreated on the users table.
+
+    python -m benchmarks.search_latency --rows 1000000
+"""
+import argparse
+
+from sqlalchemy import text
+
+from app.common.db.session import SessionLocal, engine
+from app.models.userModel import User
+from app.modules.users.repositories import usersRepo
+from app.modules.users.search.trigramIndex import search_index
+from benchmarks.common import measure, print_summary, summarize
+from benchmarks.seed import seed_users
+
+TRGM_INDEXES = [
+    index for index in User.__table__.indexes
+    if index.dialect_options["postgresql"].get("using") == "gin"
+]
+
+QUERIES = [
+    {"email": "@gmail.com"},
+    {"email": "seed42"},
+    {"first_name": "ann"},
+    {"last_name": "son"},
+    {"first_name": "ma", "last_name": "er"},
+    {"email": ".org", "gender": "female"},
+]
+
+
+# Run every search query (page + total count) and return the latency samples
+def run_phase(rounds: int, page_size: int) -> list[float]:
+    db = SessionLocal()
+    try:
+        def search(filters):
+            usersRepo.search_users(db, **filters, limit=page_size, offset=0)
+            usersRepo.count_search_users(db, **filters)
+
+        # Warm up caches so both phases are measured against a hot buffer pool
+        measure(search, QUERIES, rounds=1)
+        return measure(search, QUERIES, rounds=rounds)
+    finally:
+        db.close()
+
+
+# Same queries answered by the in-memory index, falling back to the database like the route
+def run_index_phase(rounds: int, page_size: int) -> list[float]:
+    search_index.build()
+    print(f"in-memory index: {search_index.stats()}")
+    db = SessionLocal()
+    try:
+        def search(filters):
+            filters = {field: filters.get(field) for field in ("first_name", "last_name", "email", "gender", "ip_address")}
+            if search_index.search(filters, limit=page_size, offset=0) is None:
+                usersRepo.search_users(db, **filters, limit=page_size, offset=0)
+                usersRepo.count_search_users(db, **filters)
+
+        measure(search, QUERIES, rounds=1)
+        return measure(search, QUERIES, rounds=rounds)
+    finally:
+        db.close()
+
+
+# Drop or create the trigram indexes, then refresh planner statistics
+def set_trgm_indexes(enabled: bool) -> None:
+    for index in TRGM_INDEXES:
+        if enabled:
+            index.create(bind=engine, checkfirst=True)
+        else:
+            index.drop(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE users"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+
+    total = seed_users(engine, args.rows)
+    print(f"users: {total}")
+
+    set_trgm_indexes(False)
+    print_summary("search (btree only)", summarize(run_phase(args.rounds, args.page_size)))
+
+    set_trgm_indexes(True)
+    print_summary("search (pg_trgm GIN)", summarize(run_phase(args.rounds, args.page_size)))
+
+    print_summary("search (in-memory index)", summarize(run_index_phase(args.rounds, args.page_size)))
@@ -0,0 +1,75 @@
+"""
+Seed the users table with synthetic rows shaped like app/mock_data.csv.
+
+Rows are generated inside Postgres with generate_series, so seeding a million
+users takes seconds instead of going through the ORM.
+
+    python -m benchmarks.seed --rows 1000000
+"""
+import argparse
+import time
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.common.db.base import Base
+from app.modules.auth.token.token import hash_password
+
+CSV_FILE_PATH = "./app/mock_data.csv"
+DEFAULT_PLAIN_PASSWORD = "ChangeMe123!"
+
+SEED_SQL = text("""
+    INSERT INTO users (first_name, last_name, email, gender, ip_address, hashed_password, role)
+    SELECT
+        (:first_names)[1 + (g % cardinality(CAST(:first_names AS text[])))],
+        (:last_names)[1 + ((g / 7) % cardinality(CAST(:last_names AS text[])))],
+        'seed' || g || '.' || (:email_users)[1 + (g % cardinality(CAST(:email_users AS text[])))]
+            || '@' || (:domains)[1 + ((g / 3) % cardinality(CAST(:domains AS text[])))],
+        (:genders)[1 + (g % cardinality(CAST(:genders AS text[])))],
+        ((g >> 24) & 255) || '.' || ((g >> 16) & 255) || '.' || ((g >> 8) & 255) || '.' || (g & 255),
+        :hashed_password,
+        'user'
+    FROM generate_series(:start, :stop) AS g
+    ON CONFLICT (email) DO NOTHING
+""")
+
+
+# Insert synthetic users until the table holds at least `rows` rows; returns the final row count
+def seed_users(engine: Engine, rows: int, batch_size: int = 100_000) -> int:
+    # Make sure the User model (and its indexes) is registered before create_all
+    import app.models.userModel  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    df = pd.read_csv(CSV_FILE_PATH)
+    params = {
+        "first_names": df["first_name"].dropna().unique().tolist(),
+        "last_names":  df["last_name"].dropna().unique().tolist(),
+        "email_users": df["email"].str.split("@").str[0].unique().tolist(),
+        "domains":     df["email"].str.split("@").str[1].unique().tolist(),
+        "genders":     df["gender"].dropna().unique().tolist(),
+        "hashed_password": hash_password(DEFAULT_PLAIN_PASSWORD),
+    }
+    with engine.begin() as conn:
+        existing = conn.execute(text("SELECT count(*) FROM users")).scalar()
+    start = existing
+    while start < rows:
+        stop = min(rows, start + batch_size) - 1
+        with engine.begin() as conn:
+            conn.execute(SEED_SQL, {**params, "start": start, "stop": stop})
+        start = stop + 1
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE users"))
+        return conn.execute(text("SELECT count(*) FROM users")).scalar()
+
+
+if __name__ == "__main__":
+    from app.common.db.session import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    total = seed_users(engine, args.rows)
+    print(f"users table holds {total} rows ({time.perf_counter() - started:.1f}s)")
@@ -0,0 +1,69 @@
+"""
+Rows/sec serialized by the user read path, for page sizes 50 to 1000.
+
+Compares FastAPI's default path (ORM objects -> UserOut validation via
+from_attributes -> jsonable_encoder -> stdlib json) with the projection path
+(plain dict rows -> orjson), without a database.
+
+    python -m benchmarks.serialize_rows
+"""
+import argparse
+import json
+import time
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.models.userModel import User
+from app.modules.users.schemas.userSchema import RoleEnum, UserOut
+
+PAGE_SIZES = [50, 100, 250, 500, 1000]
+users_adapter = TypeAdapter(list[UserOut])
+
+
+# Build a page of rows shaped like the UserOut projection
+def make_rows(size: int) -> list[dict]:
+    return [
+        {
+            "id": i,
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "email": f"user{i}@example.com",
+            "gender": "Female" if i % 2 else "Male",
+            "ip_address": f"10.0.{i // 256 % 256}.{i % 256}",
+            "role": RoleEnum.user,
+        }
+        for i in range(size)
+    ]
+
+
+def orm_path(rows: list[dict]) -> bytes:
+    users = [User(**row, hashed_password="x") for row in rows]
+    content = jsonable_encoder({"items": users_adapter.validate_python(users, from_attributes=True), "total": len(rows)})
+    return json.dumps(content).encode()
+
+
+def projection_path(rows: list[dict]) -> bytes:
+    return orjson.dumps({"items": rows, "total": len(rows)})
+
+
+# Rows per second for `fn` over `rounds` pages
+def rows_per_sec(fn, rows: list[dict], rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn(rows)
+    return len(rows) * rounds / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'page size':>9} {'ORM + pydantic + json':>24} {'rows + orjson':>16} {'speedup':>8}")
+    for size in PAGE_SIZES:
+        rows = make_rows(size)
+        slow = rows_per_sec(orm_path, rows, args.rounds)
+        fast = rows_per_sec(projection_path, rows, args.rounds)
+        print(f"{size:>9} {slow:>20,.0f} r/s {fast:>12,.0f} r/s {fast / slow:>7.1f}x")
@@ -0,0 +1,95 @@
+"""
+Worker startup cost: import time of app.main and time to first response.
+
+Each run starts from a fresh interpreter. Import time is measured inside a child
+process that only imports app.main (no settings or database needed). Time to first
+response spawns `uvicorn app.main:create_app --factory` and polls --path until it
+answers 200, measured from the spawn. That covers interpreter start, imports, the
+lifespan handler and the first request.
+
+Record one result per release with --json and compare them over time:
+
+    python -m benchmarks.startup --runs 10 --json startup-$(git describe --tags --always).json
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import git_revision, print_summary, summarize
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+# Seconds spent importing app.main in a fresh interpreter
+def time_import() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+# A free local TCP port
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Seconds from spawning a uvicorn worker until `path` answers 200
+def time_first_response(path: str, timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:create_app", "--factory", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+            time.sleep(0.01)
+        raise TimeoutError(f"no response from {path} within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/metrics", help="endpoint polled for the first response")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", default=None, help="write the results to this file")
+    args = parser.parse_args()
+
+    imports = [time_import() for _ in range(args.runs)]
+    print_summary("import app.main", summarize(imports))
+    first_responses = [time_first_response(args.path, args.timeout) for _ in range(args.runs)]
+    print_summary(f"first response ({args.path})", summarize(first_responses))
+
+    if args.json:
+        result = {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "runs": args.runs,
+            "import": summarize(imports),
+            "first_response": summarize(first_responses),
+        }
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"results written to {args.json}")
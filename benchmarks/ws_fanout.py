@@ -0,0 +1,121 @@
+"""
+WebSocket fan-out throughput of ConnectionManager.
+
+Registers --subscribers fake sockets (a mix of ID and search subscriptions),
+broadcasts --events user events and reports events/sec and deliveries/sec once
+every send queue has drained. A fraction of sockets can be made slow to show
+that they no longer hold back the others. With --batched every connection
+uses coalesced delivery, which shows the drop in frames written per event burst.
+
+Single events are delivered back to back without yielding, so send queues are
+sized to hold every event. With --bulk N events arrive as bulk-write bus messages
+of N events on queues of the default WS_SEND_QUEUE_SIZE, and the dropped count
+shows whether bulk writes still fit.
+
+    python -m benchmarks.ws_fanout --subscribers 10000 --events 2000 [--batched] [--bulk 30]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.common.notifications.notification import ConnectionManager
+
+DOMAINS = ["@gmail.com", "@yahoo.com", "@w3.org", "@usda.gov", "@example.com"]
+# Default of the WS_SEND_QUEUE_SIZE setting
+DEFAULT_QUEUE_SIZE = 256
+
+
+class FakeWebSocket:
+    """Minimal stand-in for starlette's WebSocket that counts delivered frames."""
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+# Build the user payload for the n-th synthetic event
+def make_event(n: int, user_ids: int) -> dict:
+    user_id = n % user_ids + 1
+    return {
+        "type": "updated",
+        "user": {
+            "id": user_id,
+            "first_name": f"First{user_id}",
+            "last_name": f"Last{user_id}",
+            "email": f"user{user_id}{DOMAINS[user_id % len(DOMAINS)]}",
+            "gender": "Female" if user_id % 2 else "Male",
+            "ip_address": f"10.0.{user_id // 256 % 256}.{user_id % 256}",
+            "role": "user",
+        },
+    }
+
+
+async def run(subscribers: int, events: int, search_ratio: float, slow_ratio: float, user_ids: int, batched: bool, bulk: int) -> None:
+    queue_size = DEFAULT_QUEUE_SIZE if bulk else events + 1
+    manager = ConnectionManager(queue_size=queue_size, slow_consumer_policy="drop", batch_window=0.05)
+    sockets = []
+    rng = random.Random(42)
+    for _ in range(subscribers):
+        ws = FakeWebSocket(delay=0.001 if rng.random() < slow_ratio else 0.0)
+        await manager.connect(ws)
+        if rng.random() < search_ratio:
+            manager.subscribe_to_search(ws, {"email": rng.choice(DOMAINS)})
+        else:
+            manager.subscribe_to_id(ws, rng.randint(1, user_ids))
+        manager.set_batched(ws, batched)
+        sockets.append(ws)
+
+    started = time.perf_counter()
+    if bulk:
+        for start in range(0, events, bulk):
+            chunk = [make_event(n, user_ids) for n in range(start, min(start + bulk, events))]
+            await manager.deliver_event({"type": "batch", "events": chunk})
+    else:
+        for n in range(events):
+            await manager.deliver_event(make_event(n, user_ids))
+    broadcast_done = time.perf_counter()
+    if manager._flush_task is not None:
+        await manager._flush_task
+
+    fast_subs = [manager.connections[ws] for ws in sockets if not ws.delay]
+    await asyncio.gather(*(_drain(sub) for sub in fast_subs))
+    drained = time.perf_counter()
+
+    delivered = sum(ws.received for ws in sockets)
+    print(f"subscribers={subscribers} events={events} search_subs={len(manager.searching)}")
+    print(f"broadcast: {events / (broadcast_done - started):,.0f} events/sec")
+    print(f"delivered (fast sockets drained): {delivered:,} frames, {delivered / (drained - started):,.0f} frames/sec")
+    print(f"dropped on fast sockets: {sum(sub.dropped for sub in fast_subs):,}")
+
+    for ws in sockets:
+        manager.disconnect(ws)
+
+
+# Wait until a subscription's queue is empty
+async def _drain(sub) -> None:
+    while not sub.queue.empty():
+        await asyncio.sleep(0.001)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=10_000)
+    parser.add_argument("--events", type=int, default=2_000)
+    parser.add_argument("--search-ratio", type=float, default=0.1, help="fraction of search subscriptions")
+    parser.add_argument("--slow-ratio", type=float, default=0.01, help="fraction of slow sockets")
+    parser.add_argument("--user-ids", type=int, default=5_000)
+    parser.add_argument("--batched", action="store_true", help="use coalesced batched delivery")
+    parser.add_argument("--bulk", type=int, default=0, help="events per bulk-write bus message (0: single events)")
+    args = parser.parse_args()
+    asyncio.run(run(args.subscribers, args.events, args.search_ratio, args.slow_ratio, args.user_ids, args.batched, args.bulk))
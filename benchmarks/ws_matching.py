@@ -0,0 +1,94 @@
+"""
+Cost of matching one user event against many WebSocket search subscriptions.
+
+Registers --subscriptions search filters drawn from app/mock_data.csv (name and
+email fragments, some with two fields) and times matching --events users against
+all of them, two ways:
+
+    linear    every subscription's filters checked in turn, lowercasing per check (the previous _match)
+    matcher   SearchMatcher: filters lowercased at subscribe time, one automaton pass per field
+
+Both must return the same subscriptions. Also reports the cost of re-subscribing
+(replacing filters) with the matcher.
+
+    python -m benchmarks.ws_matching --subscriptions 5000 --events 2000
+"""
+import argparse
+import csv
+import random
+import time
+
+from app.common.notifications.matcher import SearchMatcher
+from benchmarks.common import print_summary, summarize
+
+CSV_PATH = "app/mock_data.csv"
+FIELDS = ["first_name", "last_name", "email"]
+
+
+# Users from the mock data, shaped like event payloads
+def load_users(path: str) -> list[dict]:
+    with open(path, newline="") as f:
+        return [{"id": n, **row} for n, row in enumerate(csv.DictReader(f), start=1)]
+
+
+# A random substring filter on one or two fields of a random user
+def make_filters(rng: random.Random, users: list[dict]) -> dict:
+    user = rng.choice(users)
+    filters = {}
+    for field in rng.sample(FIELDS, rng.choice([1, 1, 2])):
+        value = user[field]
+        size = min(len(value), rng.randint(3, 6))
+        start = rng.randint(0, len(value) - size)
+        filters[field] = value[start:start + size]
+    return filters
+
+
+# The previous per-subscription check
+def linear_match(subscriptions: dict, user: dict) -> list:
+    return [
+        key for key, filters in subscriptions.items()
+        if all(str(user.get(k, "")).lower().find(str(v).lower()) >= 0 for k, v in filters.items())
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscriptions", type=int, default=5_000)
+    parser.add_argument("--events", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    users = load_users(CSV_PATH)
+    subscriptions = {key: make_filters(rng, users) for key in range(args.subscriptions)}
+    events = [rng.choice(users) for _ in range(args.events)]
+
+    matcher = SearchMatcher()
+    started = time.perf_counter()
+    for key, filters in subscriptions.items():
+        matcher.add(key, filters)
+    # The first match folds the pending patterns into the automatons
+    matcher.match(events[0])
+    print(f"subscribed {args.subscriptions} in {time.perf_counter() - started:.3f}s")
+
+    for label, match in [("linear", lambda u: linear_match(subscriptions, u)), ("matcher", matcher.match)]:
+        samples = []
+        for user in events:
+            t = time.perf_counter()
+            match(user)
+            samples.append(time.perf_counter() - t)
+        print_summary(label, summarize(samples))
+
+    mismatches = sum(sorted(matcher.match(u)) != sorted(linear_match(subscriptions, u)) for u in events[:200])
+    print(f"mismatches in the first 200 events: {mismatches}")
+
+    # Re-subscribe 1% of the subscriptions between events, as dashboards change their filters
+    churn = max(1, args.subscriptions // 100)
+    samples = []
+    for user in events:
+        t = time.perf_counter()
+        for key in rng.sample(range(args.subscriptions), churn):
+            matcher.add(key, make_filters(rng, users))
+        matcher.match(user)
+        samples.append(time.perf_counter() - t)
+    print_summary(f"matcher + {churn} re-subscriptions per event", summarize(samples))